@@ -0,0 +1,349 @@
+import bisect
+import math
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SEVERITIES = ("high", "medium", "low")
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Parse an ISO timestamp, returning None for missing or malformed values"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def ward_key(ward) -> str:
+    """Ward label used in the ward distribution"""
+    return "Unknown" if ward is None else str(ward)
+
+
+class DayBuckets:
+    """Event timestamps grouped into per-day sorted buckets.
+
+    Only the last ``keep_days`` days are retained, so counting the events in a
+    recent window costs one bucket lookup per day plus a bisect on the boundary
+    day, whatever the total number of records.
+    """
+
+    def __init__(self, keep_days: int = 8):
+        self.keep_days = keep_days
+        self.buckets: Dict[str, List[datetime]] = {}
+
+    def add(self, timestamp: Optional[datetime]):
+        if timestamp is None or timestamp < datetime.now() - timedelta(days=self.keep_days):
+            return
+        bisect.insort(self.buckets.setdefault(timestamp.date().isoformat(), []), timestamp)
+
+    def prune(self):
+        cutoff = (datetime.now() - timedelta(days=self.keep_days)).date().isoformat()
+        for day in [day for day in self.buckets if day < cutoff]:
+            del self.buckets[day]
+
+    def count_since(self, since: datetime) -> int:
+        """Number of events strictly after ``since``"""
+        self.prune()
+        total = 0
+        since_day = since.date().isoformat()
+        for day, timestamps in self.buckets.items():
+            if day > since_day:
+                total += len(timestamps)
+            elif day == since_day:
+                total += len(timestamps) - bisect.bisect_right(timestamps, since)
+        return total
+
+
+class DashboardAnalytics:
+    """Running counters behind the /api/admin/dashboard analytics.
+
+    Subscribed to the surveys and illegal constructions repositories, so the
+    counters move on every insert and update instead of being recomputed from
+    the full collections on each request.
+    """
+
+    def __init__(self, window_days: int = 7):
+        self.window_days = window_days
+        self.reset()
+
+    def reset(self):
+        self.severity = Counter()
+        self.ward_violations = Counter()
+        self.recent_surveys = DayBuckets(self.window_days + 1)
+        self.recent_violations = DayBuckets(self.window_days + 1)
+
+    def rebuild(self, surveys: Iterable[dict], violations: Iterable[dict]):
+        """Recompute every counter from the stored records"""
+        self.reset()
+        for survey in surveys:
+            self.on_change("surveys", "insert", survey, None)
+        for violation in violations:
+            self.on_change("illegal_constructions", "insert", violation, None)
+
+    def on_change(self, collection: str, op: str, record: dict, previous: Optional[dict]):
+        """Repository listener"""
+        if collection == "surveys":
+            if op == "insert":
+                self.recent_surveys.add(parse_timestamp(record.get("created_at")))
+        elif collection == "illegal_constructions":
+            if previous is not None:
+                self._count_violation(previous.get("severity"), previous.get("ward"), -1)
+            self._count_violation(record.get("severity"), record.get("ward_no"), 1)
+            if op == "insert":
+                self.recent_violations.add(parse_timestamp(record.get("detected_at")))
+
+    def _count_violation(self, severity, ward, delta: int):
+        self.severity[severity] += delta
+        key = ward_key(ward)
+        self.ward_violations[key] += delta
+        if self.ward_violations[key] <= 0:
+            del self.ward_violations[key]
+
+    def survey_analytics(self, total_surveys: int, total_violations: int) -> dict:
+        """Analytics section of the admin dashboard response"""
+        if total_surveys == 0:
+            return {
+                "total_surveys": 0,
+                "total_violations": 0,
+                "severity_breakdown": {"high": 0, "medium": 0, "low": 0},
+                "ward_distribution": {},
+                "recent_activity": {"surveys_last_week": 0, "violations_last_week": 0},
+                "compliance_rate": 0
+            }
+
+        window_start = datetime.now() - timedelta(days=self.window_days)
+        return {
+            "total_surveys": total_surveys,
+            "total_violations": total_violations,
+            "severity_breakdown": {severity: self.severity[severity] for severity in SEVERITIES},
+            "ward_distribution": dict(self.ward_violations),
+            "recent_activity": {
+                "surveys_last_week": self.recent_surveys.count_since(window_start),
+                "violations_last_week": self.recent_violations.count_since(window_start)
+            },
+            "compliance_rate": round(((total_surveys - total_violations) / total_surveys) * 100, 2)
+        }
+
+
+# Periods of the trend rollups; weeks start on Monday, months on the 1st
+GRANULARITIES = ("day", "week", "month")
+# Resolution times are counted in log-spaced bins, RESOLUTION_BINS_PER_DOUBLING
+# per doubling of the time in minutes, so a median read off the bins is within
+# about 4.5% of the exact one
+RESOLUTION_BINS_PER_DOUBLING = 8
+# Statuses in which a complaint with a resolved_at counts as resolved
+RESOLVED_STATUSES = ("Resolved", "Closed")
+
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def periods_back(last: date, granularity: str, count: int) -> date:
+    """Start of the period ``count - 1`` periods before the one holding ``last``"""
+    start = period_start(last, granularity)
+    for _ in range(count - 1):
+        start = period_start(start - timedelta(days=1), granularity)
+    return start
+
+
+def period_count(first: date, last: date, granularity: str) -> int:
+    """Number of periods from the one holding ``first`` to the one holding ``last``"""
+    if granularity == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    days = (period_start(last, granularity) - period_start(first, granularity)).days
+    return days // 7 + 1 if granularity == "week" else days + 1
+
+
+def periods(first: date, last: date, granularity: str) -> List[date]:
+    """Starts of the periods from the one holding ``first`` to the one holding ``last``"""
+    starts = []
+    current = period_start(first, granularity)
+    while current <= last:
+        starts.append(current)
+        current = next_period(current, granularity)
+    return starts
+
+
+def column_text(value) -> Optional[str]:
+    """Dimension value as text, matching the index column values listeners get as ``previous``"""
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def resolution_bin(minutes: float) -> int:
+    return math.floor(RESOLUTION_BINS_PER_DOUBLING * math.log2(max(minutes, 1.0)))
+
+
+def bin_hours(index: int) -> float:
+    """Representative resolution time of a bin: its geometric middle, in hours"""
+    return 2 ** ((index + 0.5) / RESOLUTION_BINS_PER_DOUBLING) / 60
+
+
+def histogram_median(bins: Counter) -> Optional[float]:
+    """Median of a resolution time histogram, in hours"""
+    total = sum(bins.values())
+    if total == 0:
+        return None
+    seen = 0
+    for index in sorted(bins):
+        seen += bins[index]
+        if seen * 2 >= total:
+            return round(bin_hours(index), 2)
+
+
+class Rollup:
+    """Event counts per period of each granularity, keyed by a tuple of dimensions"""
+
+    def __init__(self, dimensions: Tuple[str, ...]):
+        self.dimensions = dimensions
+        self.tables: Dict[str, Dict[date, Counter]] = {granularity: {} for granularity in GRANULARITIES}
+
+    def add(self, moment: Optional[datetime], key: tuple, delta: int):
+        if moment is None:
+            return
+        day = moment.date()
+        for granularity, table in self.tables.items():
+            start = period_start(day, granularity)
+            counts = table.setdefault(start, Counter())
+            counts[key] += delta
+            if counts[key] <= 0:
+                del counts[key]
+                if not counts:
+                    del table[start]
+
+    def select(self, granularity: str, start: date, filters: Dict[str, str], group_by: Tuple[str, ...]) -> Counter:
+        """Counts of one period matching ``filters``, keyed by their values of the ``group_by`` dimensions"""
+        result = Counter()
+        counts = self.tables[granularity].get(start)
+        if not counts:
+            return result
+        positions = [(self.dimensions.index(dimension), value) for dimension, value in filters.items()]
+        groups = [self.dimensions.index(dimension) for dimension in group_by]
+        for key, count in counts.items():
+            if all(key[position] == value for position, value in positions):
+                result[tuple(key[group] for group in groups)] += count
+        return result
+
+
+class TrendRollups:
+    """Pre-aggregated time series behind /api/analytics/timeseries.
+
+    Complaints are counted per submission period by ward, category and current
+    status; violations per detection period by ward and severity; resolution
+    times (submitted_at to resolved_at) per resolution period in a histogram
+    by ward and category. Each is kept per day, week and month and adjusted
+    on every insert and update as a repository listener, so a query reads one
+    table entry per period of its window.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.complaints = Rollup(("ward", "category", "status"))
+        self.violations = Rollup(("ward", "severity"))
+        self.resolutions = Rollup(("ward", "category", "bin"))
+        # Complaint id -> (resolved_at, key) counted in the resolution histogram; the
+        # listener's previous values lack resolved_at, so what was counted is kept here
+        self.resolved: Dict[str, Tuple[datetime, tuple]] = {}
+
+    def rebuild(self, complaints: Iterable[dict], violations: Iterable[dict]):
+        """Recompute every rollup from the stored records"""
+        self.reset()
+        for complaint in complaints:
+            self.on_change("complaints", "insert", complaint, None)
+        for violation in violations:
+            self.on_change("illegal_constructions", "insert", violation, None)
+
+    def on_change(self, collection: str, op: str, record: dict, previous: Optional[dict]):
+        """Repository listener"""
+        if collection == "complaints":
+            if previous is not None:
+                self.complaints.add(parse_timestamp(previous.get("submitted_at")),
+                                    (ward_key(previous.get("ward")), previous.get("category"), previous.get("status")), -1)
+            self.complaints.add(parse_timestamp(record.get("submitted_at")),
+                                (ward_key(record.get("ward")), column_text(record.get("category")), column_text(record.get("status"))), 1)
+            self._count_resolution(record)
+        elif collection == "illegal_constructions":
+            if previous is not None:
+                self.violations.add(parse_timestamp(previous.get("submitted_at")),
+                                    (ward_key(previous.get("ward")), previous.get("severity")), -1)
+            self.violations.add(parse_timestamp(record.get("detected_at")),
+                                (ward_key(record.get("ward_no")), column_text(record.get("severity"))), 1)
+
+    def _count_resolution(self, complaint: dict):
+        counted = None
+        submitted_at = parse_timestamp(complaint.get("submitted_at"))
+        resolved_at = parse_timestamp(complaint.get("resolved_at"))
+        if complaint.get("status") in RESOLVED_STATUSES and submitted_at is not None and resolved_at is not None:
+            try:
+                minutes = (resolved_at - submitted_at).total_seconds() / 60
+            except TypeError:  # one timestamp with a time zone, the other without
+                minutes = -1
+            if minutes >= 0:
+                counted = (resolved_at, (ward_key(complaint.get("ward")), column_text(complaint.get("category")), resolution_bin(minutes)))
+
+        before = self.resolved.get(complaint["id"])
+        if counted == before:
+            return
+        if before is not None:
+            self.resolutions.add(before[0], before[1], -1)
+            del self.resolved[complaint["id"]]
+        if counted is not None:
+            self.resolutions.add(counted[0], counted[1], 1)
+            self.resolved[complaint["id"]] = counted
+
+    def series(self, metric: str, granularity: str, first: date, last: date,
+               filters: Dict[str, str], group_by: Optional[str]) -> dict:
+        """Per-period values of ``metric`` from the period holding ``first`` to the one holding ``last``.
+
+        ``complaints`` and ``violations`` give counts, ``resolution_time`` the
+        number resolved and their approximate median time in hours. Every
+        period of the window is listed, empty ones included.
+        """
+        groups = (group_by,) if group_by else ()
+        points = []
+        if metric == "resolution_time":
+            window = Counter()
+            for start in periods(first, last, granularity):
+                histograms: Dict[Optional[str], Counter] = {}
+                for key, count in self.resolutions.select(granularity, start, filters, groups + ("bin",)).items():
+                    histograms.setdefault(key[0] if group_by else None, Counter())[key[-1]] += count
+                period = Counter()
+                for bins in histograms.values():
+                    period.update(bins)
+                window.update(period)
+                point = {"period": start.isoformat(), "resolved": sum(period.values()), "median_hours": histogram_median(period)}
+                if group_by:
+                    point["groups"] = {
+                        group: {"resolved": sum(bins.values()), "median_hours": histogram_median(bins)}
+                        for group, bins in histograms.items()
+                    }
+                points.append(point)
+            return {"series": points, "resolved": sum(window.values()), "median_hours": histogram_median(window)}
+
+        rollup = self.complaints if metric == "complaints" else self.violations
+        total = 0
+        for start in periods(first, last, granularity):
+            counts = rollup.select(granularity, start, filters, groups)
+            point = {"period": start.isoformat(), "total": sum(counts.values())}
+            if group_by:
+                point["groups"] = {key[0]: count for key, count in counts.items()}
+            total += point["total"]
+            points.append(point)
+        return {"series": points, "total": total}
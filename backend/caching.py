@@ -0,0 +1,101 @@
+import hashlib
+import json
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+# Route -> names of the query parameters its endpoint declares
+_declared_parameters: Dict[int, FrozenSet[str]] = {}
+
+
+def declared_parameters(request: Request) -> Optional[FrozenSet[str]]:
+    """Query parameters the matched endpoint and its dependencies read, None outside a route"""
+    route = request.scope.get("route")
+    dependant = getattr(route, "dependant", None)
+    if dependant is None:
+        return None
+    names = _declared_parameters.get(id(route))
+    if names is None:
+        found = set()
+        pending = [dependant]
+        while pending:
+            current = pending.pop()
+            found.update(field.alias for field in current.query_params)
+            pending.extend(current.dependencies)
+        names = _declared_parameters[id(route)] = frozenset(found)
+    return names
+
+
+def request_key(request: Request) -> str:
+    """Cache key for a GET request: path plus its sorted query parameters.
+
+    Parameters the endpoint does not declare are left out, so cache-busting
+    additions such as ``?_=<timestamp>`` share the entry of the plain request.
+    """
+    declared = declared_parameters(request)
+    query = "&".join(
+        f"{key}={value}" for key, value in sorted(request.query_params.multi_items())
+        if declared is None or key in declared
+    )
+    return f"{request.url.path}?{query}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers the given strong ETag"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+class VersionedResponseCache:
+    """Encoded JSON responses keyed by request and the collection versions they were built from.
+
+    ETags are derived from the versions (plus a per-process epoch, since
+    versions restart at zero), so a conditional GET for unchanged data is
+    answered with 304 without building or encoding anything, and a repeated
+    unconditional GET reuses the encoded body. The bodies kept take at most
+    ``max_bytes`` together; the least recently used go first, and a body
+    larger than that is not kept at all.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.epoch = uuid.uuid4().hex[:8]
+        self.entries: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+
+    def etag(self, key: str, versions: tuple, extra=None) -> str:
+        material = json.dumps([key, list(versions), extra], sort_keys=True, default=str)
+        return f'"{self.epoch}-{hashlib.sha1(material.encode("utf-8")).hexdigest()[:20]}"'
+
+    def respond(self, request: Request, versions: tuple, build: Callable[[], dict], extra=None) -> Response:
+        """Answer a GET from the cache, with 304 when the client already has this version"""
+        key = request_key(request)
+        etag = self.etag(key, versions, extra)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        cached = self.entries.get(key)
+        if cached is not None and cached[0] == etag:
+            self.entries.move_to_end(key)
+            body = cached[1]
+        else:
+            body = json.dumps(build(), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+            if cached is not None:
+                del self.entries[key]
+                self.size -= len(cached[1])
+            if len(body) <= self.max_bytes:
+                self.entries[key] = (etag, body)
+                self.size += len(body)
+                while self.size > self.max_bytes:
+                    _, (_, evicted) = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+
+        return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,202 @@
+import math
+import random
+import unicodedata
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Signatures are then computed in pure Python, more slowly
+    np = None
+
+from analytics import parse_timestamp
+from spatial import record_location
+
+# MinHash signature length, split into 21 LSH bands of BAND_ROWS values. Two
+# texts of Jaccard similarity s share at least one band with probability
+# 1 - (1 - s^3)^21: 0.16 at s=0.2, 0.43 at s=0.3, 0.94 at s=0.5
+SIGNATURE_SIZE = 64
+BAND_ROWS = 3
+# Character trigrams: a rephrased report of the same issue typically scores
+# 0.5-0.65 against the original, a different issue of the same category 0.15-0.3
+SHINGLE_SIZE = 3
+
+MASK64 = (1 << 64) - 1
+# Fixed seed: signatures must not change between restarts
+_random = random.Random(20250819)
+HASH_MULTIPLIERS = [_random.getrandbits(64) | 1 for _ in range(SIGNATURE_SIZE)]
+HASH_OFFSETS = [_random.getrandbits(64) for _ in range(SIGNATURE_SIZE)]
+if np is not None:
+    MULTIPLIER_ARRAY = np.array(HASH_MULTIPLIERS, dtype=np.uint64)
+    OFFSET_ARRAY = np.array(HASH_OFFSETS, dtype=np.uint64)
+
+# Complaints in these states are not linked to any more
+CLOSED_STATUSES = {"resolved", "closed", "rejected"}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase words with punctuation and symbols removed; letters, digits
+    and combining marks (Devanagari vowel signs) are kept"""
+    characters = [
+        character if character.isalnum() or unicodedata.category(character)[0] == "M" else " "
+        for character in text.lower()
+    ]
+    return " ".join("".join(characters).split())
+
+
+def shingle_hashes(text: str) -> List[int]:
+    """32-bit hashes of the distinct character shingles of a normalized text"""
+    if len(text) <= SHINGLE_SIZE:
+        return [zlib.crc32(text.encode("utf-8"))] if text else []
+    return list({zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8")) for i in range(len(text) - SHINGLE_SIZE + 1)})
+
+
+def minhash(hashes: List[int]) -> Tuple[int, ...]:
+    """MinHash signature: the minimum of each multiply-shift hash over the shingles"""
+    if np is not None:
+        values = np.array(hashes, dtype=np.uint64)
+        # uint64 arithmetic wraps around, which is what multiply-shift hashing needs
+        permuted = (np.outer(values, MULTIPLIER_ARRAY) + OFFSET_ARRAY) >> np.uint64(32)
+        return tuple(permuted.min(axis=0).tolist())
+    return tuple(
+        min(((multiplier * value + offset) & MASK64) >> 32 for value in hashes)
+        for multiplier, offset in zip(HASH_MULTIPLIERS, HASH_OFFSETS)
+    )
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(1 for a, b in zip(first, second) if a == b) / SIGNATURE_SIZE
+
+
+class DuplicateIndex:
+    """Recent complaints indexed for near-duplicate lookups.
+
+    Complaints are scoped by category and a location cell of ``cell_degrees``;
+    within a scope, the MinHash signatures of their title and description are
+    banded into LSH buckets. A lookup hashes the new complaint's bands in its
+    own and the eight neighbouring cells and compares signatures only with
+    the complaints found there, so its cost does not depend on how many
+    complaints exist. Complaints older than ``window_hours`` fall out.
+    Complaints without a location are never matched.
+    """
+
+    def __init__(self, window_hours: float = 72, threshold: float = 0.5, cell_degrees: float = 0.002):
+        self.window = timedelta(hours=window_hours)
+        self.threshold = threshold
+        self.cell_degrees = cell_degrees
+        self.reset()
+
+    def reset(self):
+        self.buckets: Dict[tuple, Set[str]] = {}
+        self.entries: Dict[str, dict] = {}
+        self.timeline = deque()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def signature(self, record: dict) -> Optional[Tuple[int, ...]]:
+        text = normalize_text(f"{record.get('title') or ''} {record.get('description') or ''}")
+        hashes = shingle_hashes(text)
+        return minhash(hashes) if hashes else None
+
+    def scope(self, record: dict) -> Optional[Tuple[str, int, int]]:
+        location = record_location(record)
+        if location is None:
+            return None
+        category = str(record.get("category") or "").strip().lower()
+        return category, math.floor(location[0] / self.cell_degrees), math.floor(location[1] / self.cell_degrees)
+
+    def band_keys(self, scope: Tuple[str, int, int], signature: Tuple[int, ...]) -> List[tuple]:
+        return [
+            (scope, band, signature[band * BAND_ROWS:(band + 1) * BAND_ROWS])
+            for band in range(SIGNATURE_SIZE // BAND_ROWS)
+        ]
+
+    def add(self, record: dict):
+        """Index a complaint that was just stored"""
+        scope = self.scope(record)
+        submitted_at = parse_timestamp(record.get("submitted_at"))
+        if scope is None or submitted_at is None or record["id"] in self.entries:
+            return
+        signature = self.signature(record)
+        if signature is None:
+            return
+        keys = self.band_keys(scope, signature)
+        self.entries[record["id"]] = {
+            "signature": signature,
+            "keys": keys,
+            "submitted_at": submitted_at,
+            "cluster": record.get("duplicate_of") or record["id"],
+        }
+        for key in keys:
+            self.buckets.setdefault(key, set()).add(record["id"])
+        self.timeline.append((submitted_at, record["id"]))
+
+    def remove(self, record_id: str):
+        entry = self.entries.pop(record_id, None)
+        if entry is None:
+            return
+        for key in entry["keys"]:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(record_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def prune(self, now: datetime):
+        """Drop complaints submitted before the window"""
+        cutoff = now - self.window
+        while self.timeline and self.timeline[0][0] < cutoff:
+            _, record_id = self.timeline.popleft()
+            self.remove(record_id)
+
+    def find(self, record: dict) -> List[Tuple[float, str, str]]:
+        """``(similarity, complaint id, cluster id)`` of recent complaints similar to ``record``, best first"""
+        self.prune(datetime.now())
+        scope = self.scope(record)
+        signature = self.signature(record) if scope is not None else None
+        if signature is None:
+            return []
+
+        category, row, column = scope
+        candidates = set()
+        for row_offset in (-1, 0, 1):
+            for column_offset in (-1, 0, 1):
+                neighbour = (category, row + row_offset, column + column_offset)
+                for key in self.band_keys(neighbour, signature):
+                    candidates.update(self.buckets.get(key, ()))
+        candidates.discard(record.get("id"))
+
+        matches = []
+        for candidate in candidates:
+            entry = self.entries[candidate]
+            score = similarity(signature, entry["signature"])
+            if score >= self.threshold:
+                matches.append((score, candidate, entry["cluster"]))
+        matches.sort(reverse=True)
+        return matches
+
+    def rebuild(self, complaints: Iterable[dict]):
+        """Index the open complaints submitted within the window"""
+        self.reset()
+        cutoff = datetime.now() - self.window
+        recent = []
+        for complaint in complaints:
+            if str(complaint.get("status") or "").lower() in CLOSED_STATUSES:
+                continue
+            submitted_at = parse_timestamp(complaint.get("submitted_at"))
+            if submitted_at is not None and submitted_at >= cutoff:
+                recent.append((submitted_at, complaint))
+        recent.sort(key=lambda item: item[0])
+        for _, complaint in recent:
+            self.add(complaint)
+
+    def on_change(self, collection: str, op: str, record: dict, previous: Optional[dict]):
+        """Repository listener: new complaints are indexed, closed ones stop attracting duplicates"""
+        if op == "insert":
+            self.add(record)
+        elif str(record.get("status") or "").lower() in CLOSED_STATUSES:
+            self.remove(record["id"])
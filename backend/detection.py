@@ -0,0 +1,373 @@
+try:
+    import numpy as np
+except ImportError:  # The columnar engine is optional; detection falls back to the scalar loop
+    np = None
+
+# Surveys with at least this many buildings and roads use the columnar engine in "auto" mode
+COLUMNAR_MIN_STRUCTURES = 64
+
+# Largest magnitude up to which every integer is exact in a float64 column
+EXACT_INTEGER_LIMIT = 2 ** 53
+
+
+def validate_and_clean_survey_data(survey_data):
+    """Validate and clean survey data to ensure proper types"""
+    if not isinstance(survey_data, dict):
+        print("Warning: survey_data is not a dictionary")
+        return None
+
+    # Ensure buildings array exists and is a list
+    if "buildings" not in survey_data:
+        survey_data["buildings"] = []
+    elif not isinstance(survey_data["buildings"], list):
+        survey_data["buildings"] = []
+
+    # Ensure roads array exists and is a list
+    if "roads" not in survey_data:
+        survey_data["roads"] = []
+    elif not isinstance(survey_data["roads"], list):
+        survey_data["roads"] = []
+
+    # Ensure land_usage object exists
+    if "land_usage" not in survey_data:
+        survey_data["land_usage"] = {}
+    elif not isinstance(survey_data["land_usage"], dict):
+        survey_data["land_usage"] = {}
+
+    return survey_data
+
+# Violation records, shared by both engines so they produce identical output
+
+def height_violation(building, height_meters, zone_rules, building_type):
+    return {
+        "building_id": building.get("building_id"),
+        "type": "height_violation",
+        "current": height_meters,
+        "allowed": zone_rules.height_limit,
+        "severity": "high",
+        "description": f"Building height {height_meters}m exceeds limit of {zone_rules.height_limit}m for {building_type} zone"
+    }
+
+def floor_violation(building, floors, zone_rules, building_type):
+    return {
+        "building_id": building.get("building_id"),
+        "type": "floor_violation",
+        "current": floors,
+        "allowed": zone_rules.max_floors,
+        "severity": "high",
+        "description": f"Building has {floors} floors, exceeding limit of {zone_rules.max_floors} for {building_type} zone"
+    }
+
+def far_violation(building, far, zone_rules, building_type):
+    return {
+        "building_id": building.get("building_id"),
+        "type": "far_violation",
+        "current": round(far, 2),
+        "allowed": zone_rules.far_limit,
+        "severity": "medium",
+        "description": f"FAR {round(far, 2)} exceeds limit of {zone_rules.far_limit} for {building_type} zone"
+    }
+
+def setback_violation(building, front_setback, required_front, building_type):
+    return {
+        "building_id": building.get("building_id"),
+        "type": "setback_violation",
+        "current": front_setback,
+        "allowed": required_front,
+        "severity": "medium",
+        "description": f"Front setback {front_setback}m is less than required {required_front}m for {building_type} zone"
+    }
+
+def road_width_violation(road, width_meters, min_width, road_type):
+    return {
+        "road_id": road.get("road_id"),
+        "type": "road_width_violation",
+        "current": width_meters,
+        "allowed": min_width,
+        "severity": "medium",
+        "description": f"Road width {width_meters}m is less than minimum {min_width}m for {road_type} surface"
+    }
+
+def road_encroachment_violation(road, length_meters):
+    return {
+        "road_id": road.get("road_id"),
+        "type": "road_encroachment_suspicion",
+        "current": length_meters,
+        "allowed": 5,
+        "severity": "low",
+        "description": f"Road length {length_meters}m is suspiciously short, possible encroachment"
+    }
+
+def floor_area_ratio(area_sq_meters, floors):
+    plot_area = area_sq_meters / floors
+    return area_sq_meters / plot_area if plot_area > 0 else 0
+
+def survey_level_violations(survey_data):
+    """Land usage and completeness checks, evaluated once per survey"""
+    violations = []
+    land_usage = survey_data.get("land_usage", {})
+
+    # Convert string values to float for land usage calculations with error handling
+    try:
+        residential_area = float(land_usage.get("residential_area_sq_meters", 0) or 0)
+        commercial_area = float(land_usage.get("commercial_area_sq_meters", 0) or 0)
+        industrial_area = float(land_usage.get("industrial_area_sq_meters", 0) or 0)
+        green_area = float(land_usage.get("green_area_sq_meters", 0) or 0)
+
+        total_area = residential_area + commercial_area + industrial_area
+
+        if total_area > 0:
+            green_area_percent = (green_area / total_area) * 100
+            min_green_area = 10  # Default minimum
+
+            # Adjust based on zone type if available
+            if survey_data.get("zone_type") == "commercial":
+                min_green_area = 5
+            elif survey_data.get("zone_type") == "industrial":
+                min_green_area = 8
+
+            if green_area_percent < min_green_area:
+                violations.append({
+                    "type": "green_area_violation",
+                    "current": round(green_area_percent, 2),
+                    "allowed": min_green_area,
+                    "severity": "low",
+                    "description": f"Green area {round(green_area_percent, 2)}% is less than minimum {min_green_area}% requirement"
+                })
+
+            # Check for excessive commercial/industrial area in residential zones
+            if survey_data.get("zone_type") == "residential":
+                commercial_percent = (commercial_area / total_area) * 100
+                if commercial_percent > 20:  # Max 20% commercial in residential zone
+                    violations.append({
+                        "type": "zone_misuse_violation",
+                        "current": round(commercial_percent, 2),
+                        "allowed": 20,
+                        "severity": "high",
+                        "description": f"Commercial area {round(commercial_percent, 2)}% exceeds 20% limit in residential zone"
+                    })
+    except (ValueError, TypeError) as e:
+        print(f"Warning: Failed to convert land usage data: {e}")
+        # Skip land usage validation if conversion fails
+        pass
+
+    # Check for missing essential data
+    if not survey_data.get("buildings") and not survey_data.get("roads"):
+        violations.append({
+            "type": "data_incomplete_violation",
+            "current": "No buildings or roads data",
+            "allowed": "Complete survey data required",
+            "severity": "medium",
+            "description": "Survey data is incomplete - missing buildings and roads information"
+        })
+
+    return violations
+
+def detect_scalar(survey_data, rules):
+    """Reference engine: one building and one road at a time"""
+    violations = []
+
+    # Check building violations
+    for building in survey_data.get("buildings", []):
+        building_type = building.get("type", "residential")
+        zone_rules = rules.zone(building_type)
+
+        # Convert string values to float/int for comparison with error handling
+        try:
+            height_meters = float(building.get("height_meters", 0) or 0)
+            floors = int(building.get("floors", 0) or 0)
+            area_sq_meters = float(building.get("area_sq_meters", 0) or 0)
+        except (ValueError, TypeError) as e:
+            print(f"Warning: Failed to convert building data for building {building.get('building_id', 'unknown')}: {e}")
+            # Skip this building if conversion fails
+            continue
+
+        # Height violations
+        if height_meters > zone_rules.height_limit:
+            violations.append(height_violation(building, height_meters, zone_rules, building_type))
+
+        # Floor violations
+        if floors > zone_rules.max_floors:
+            violations.append(floor_violation(building, floors, zone_rules, building_type))
+
+        # FAR violations (Floor Area Ratio)
+        if floors > 0 and area_sq_meters > 0:
+            far = floor_area_ratio(area_sq_meters, floors)
+            if far > zone_rules.far_limit:
+                violations.append(far_violation(building, far, zone_rules, building_type))
+
+        # Setback violations (if setback data is provided)
+        setbacks = building.get("setbacks", {})
+        if setbacks:
+            try:
+                front_setback = float(setbacks.get("front_setback_meters", 0) or 0)
+                required_front = zone_rules.front_setback
+                if front_setback < required_front:
+                    violations.append(setback_violation(building, front_setback, required_front, building_type))
+            except (ValueError, TypeError):
+                # Skip setback validation if conversion fails
+                pass
+
+    # Check road violations
+    for road in survey_data.get("roads", []):
+        road_type = road.get("surface_type", "asphalt")
+        min_width = 9 if road_type in ["asphalt", "concrete"] else 6
+
+        # Convert string values to float for comparison with error handling
+        try:
+            width_meters = float(road.get("width_meters", 0) or 0)
+            length_meters = float(road.get("length_meters", 0) or 0)
+        except (ValueError, TypeError) as e:
+            print(f"Warning: Failed to convert road data for road {road.get('road_id', 'unknown')}: {e}")
+            # Skip this road if conversion fails
+            continue
+
+        if width_meters < min_width:
+            violations.append(road_width_violation(road, width_meters, min_width, road_type))
+
+        # Check road length for very short roads (potential encroachment)
+        if length_meters < 5:
+            violations.append(road_encroachment_violation(road, length_meters))
+
+    violations.extend(survey_level_violations(survey_data))
+    return violations
+
+
+class UnsupportedColumns(Exception):
+    """Input the columnar engine does not reproduce exactly; the scalar engine handles it"""
+
+
+def numeric_column(values, integral: bool = False):
+    """float64 column from plain JSON numbers.
+
+    Only ints, floats and bools are accepted; strings and other values keep
+    their Python conversion rules by going through the scalar engine. For
+    integral columns (floors, converted with int()) non-finite values are
+    refused as well.
+    """
+    types = set(map(type, values))
+    if not types <= {int, float, bool}:
+        raise UnsupportedColumns
+    try:
+        column = np.array(values, dtype=np.float64)
+    except OverflowError:
+        raise UnsupportedColumns
+    if int in types and len(column) and np.abs(column).max() >= EXACT_INTEGER_LIMIT:
+        raise UnsupportedColumns
+    if integral:
+        if not np.isfinite(column).all():
+            raise UnsupportedColumns
+        column = np.trunc(column)
+    return column
+
+def building_violations_columnar(buildings, rules):
+    count = len(buildings)
+    if count == 0:
+        return []
+    if not set(map(type, buildings)) <= {dict}:
+        raise UnsupportedColumns
+
+    types = [building.get("type", "residential") for building in buildings]
+    if not set(map(type, types)) <= {str}:
+        raise UnsupportedColumns
+    heights = numeric_column([building.get("height_meters", 0) or 0 for building in buildings])
+    floors = numeric_column([building.get("floors", 0) or 0 for building in buildings], integral=True)
+    areas = numeric_column([building.get("area_sq_meters", 0) or 0 for building in buildings])
+
+    setbacks = [building.get("setbacks", {}) for building in buildings]
+    has_setbacks = np.fromiter(map(bool, setbacks), dtype=bool, count=count)
+    provided = [setback for setback in setbacks if setback]
+    if not set(map(type, provided)) <= {dict}:
+        raise UnsupportedColumns
+    fronts = np.zeros(count)
+    fronts[has_setbacks] = numeric_column([setback.get("front_setback_meters", 0) or 0 for setback in provided])
+
+    # Group by zone type: one regulation lookup per distinct type, then gather per building
+    names = {}
+    codes = np.fromiter((names.setdefault(name, len(names)) for name in types), dtype=np.intp, count=count)
+    zones, limits = rules.limits(list(names))
+    limits = limits[codes]
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        plot_areas = areas / floors
+        far = np.where(plot_areas > 0, areas / plot_areas, 0.0)
+
+    hits = np.column_stack([
+        heights > limits[:, 0],
+        floors > limits[:, 1],
+        (floors > 0) & (areas > 0) & (far > limits[:, 2]),
+        has_setbacks & (fronts < limits[:, 3]),
+    ])
+
+    # Records only for the violations, in the scalar engine's order
+    violations = []
+    for index, rule in zip(*np.nonzero(hits)):
+        building, building_type, zone_rules = buildings[index], types[index], zones[codes[index]]
+        if rule == 0:
+            violations.append(height_violation(building, float(building.get("height_meters", 0) or 0), zone_rules, building_type))
+        elif rule == 1:
+            violations.append(floor_violation(building, int(building.get("floors", 0) or 0), zone_rules, building_type))
+        elif rule == 2:
+            area_sq_meters = float(building.get("area_sq_meters", 0) or 0)
+            floor_count = int(building.get("floors", 0) or 0)
+            violations.append(far_violation(building, floor_area_ratio(area_sq_meters, floor_count), zone_rules, building_type))
+        else:
+            front_setback = float(building["setbacks"].get("front_setback_meters", 0) or 0)
+            violations.append(setback_violation(building, front_setback, zone_rules.front_setback, building_type))
+    return violations
+
+def road_violations_columnar(roads):
+    count = len(roads)
+    if count == 0:
+        return []
+    if not set(map(type, roads)) <= {dict}:
+        raise UnsupportedColumns
+
+    surfaces = [road.get("surface_type", "asphalt") for road in roads]
+    if not set(map(type, surfaces)) <= {str}:
+        raise UnsupportedColumns
+    widths = numeric_column([road.get("width_meters", 0) or 0 for road in roads])
+    lengths = numeric_column([road.get("length_meters", 0) or 0 for road in roads])
+
+    surface_array = np.array(surfaces)
+    min_widths = np.where((surface_array == "asphalt") | (surface_array == "concrete"), 9, 6)
+    hits = np.column_stack([widths < min_widths, lengths < 5])
+
+    violations = []
+    for index, rule in zip(*np.nonzero(hits)):
+        road = roads[index]
+        if rule == 0:
+            violations.append(road_width_violation(road, float(road.get("width_meters", 0) or 0), int(min_widths[index]), surfaces[index]))
+        else:
+            violations.append(road_encroachment_violation(road, float(road.get("length_meters", 0) or 0)))
+    return violations
+
+def detect_columnar(survey_data, rules):
+    """Columnar engine: buildings and roads as NumPy arrays, every rule as one vector comparison"""
+    violations = building_violations_columnar(survey_data.get("buildings", []), rules)
+    violations.extend(road_violations_columnar(survey_data.get("roads", [])))
+    violations.extend(survey_level_violations(survey_data))
+    return violations
+
+def detect_illegal_constructions(survey_data, rules, engine: str = "auto"):
+    """Detect illegal constructions based on survey data and a compiled rule set.
+
+    ``engine`` is "scalar", "columnar", or "auto" (columnar for surveys of at
+    least COLUMNAR_MIN_STRUCTURES structures when NumPy is installed). The
+    columnar engine hands any survey it cannot reproduce exactly, such as
+    numbers sent as strings, to the scalar engine, so both return the same
+    records in the same order.
+    """
+    # Validate and clean survey data
+    survey_data = validate_and_clean_survey_data(survey_data)
+    if survey_data is None:
+        print("Warning: Invalid survey data, skipping validation")
+        return []
+
+    structures = len(survey_data["buildings"]) + len(survey_data["roads"])
+    if np is not None and (engine == "columnar" or (engine == "auto" and structures >= COLUMNAR_MIN_STRUCTURES)):
+        try:
+            return detect_columnar(survey_data, rules)
+        except UnsupportedColumns:
+            pass
+    return detect_scalar(survey_data, rules)
@@ -0,0 +1,182 @@
+import asyncio
+import bisect
+import json
+import uuid
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Record fields copied into change events
+EVENT_FIELDS = ("ward", "status", "severity", "category", "submitted_at")
+
+
+class Subscription:
+    """One connected client: its filters and a bounded buffer of pending events.
+
+    When the buffer is full the oldest event is dropped, so a slow consumer
+    never holds up the handlers producing changes; the client is told how
+    many events it missed and can refetch.
+    """
+
+    def __init__(self, collections: Optional[Set[str]], ward: Optional[str], buffer_size: int):
+        self.collections = collections
+        self.ward = ward
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def wants(self, event: dict) -> bool:
+        if self.collections is not None and event["collection"] not in self.collections:
+            return False
+        return self.ward is None or event.get("ward") == self.ward
+
+    def offer(self, event: dict):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(event)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        """Next event for the client; None when nothing arrived within ``timeout``"""
+        if not self.buffer and not self.closed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return {"type": "overflow", "dropped": dropped}
+        if self.buffer:
+            return self.buffer.popleft()
+        return None
+
+
+class ChangeLog:
+    """Sequence-numbered log of changed records, the source of every change sequence number.
+
+    Only the latest sequence of each record is kept live, and the log holds at
+    most ``capacity`` entries; older ones are compacted away, and a client
+    asking for changes from before the horizon has to resync in full.
+    Sequence numbers restart with the process, so they are paired with a
+    random ``epoch`` that must accompany any ``since`` above 0. The records
+    loaded at startup have no entries: they count as sequence 1, which starts
+    out as the horizon, so a new client (``since=0``) always resyncs first.
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self.epoch = uuid.uuid4().hex[:8]
+        # Sequence 1 stands for the state loaded at startup
+        self.sequence = 1
+        self.horizon = 1
+        self.entries: List[Tuple[int, str, str]] = []
+        self.latest: Dict[Tuple[str, str], int] = {}
+
+    def append(self, collection: str, record_id: str) -> int:
+        """Record that a record changed and return the new sequence number"""
+        self.sequence += 1
+        self.entries.append((self.sequence, collection, record_id))
+        self.latest[(collection, record_id)] = self.sequence
+        if len(self.entries) > 2 * self.capacity:
+            self.compact()
+        return self.sequence
+
+    def compact(self):
+        """Drop all but the newest ``capacity`` entries and move the horizon past them"""
+        cut = len(self.entries) - self.capacity
+        if cut <= 0:
+            return
+        for seq, collection, record_id in self.entries[:cut]:
+            if self.latest.get((collection, record_id)) == seq:
+                del self.latest[(collection, record_id)]
+        self.horizon = self.entries[cut - 1][0]
+        del self.entries[:cut]
+
+    def needs_resync(self, since: int, epoch: Optional[str] = None) -> bool:
+        """Whether changes after ``since`` can no longer be served from the log"""
+        if since > 0 and epoch != self.epoch:
+            # Issued by an earlier process, or by one we cannot tell
+            return True
+        return since < self.horizon or since > self.sequence
+
+    def since(self, since: int, collections: Optional[Set[str]] = None,
+              limit: Optional[int] = None) -> Tuple[List[Tuple[int, str, str]], int]:
+        """Latest change of each record changed after ``since``, oldest first.
+
+        Returns up to ``limit`` ``(seq, collection, id)`` entries and the
+        sequence to ask from next time.
+        """
+        changes = []
+        position = since
+        start = bisect.bisect_right(self.entries, (since, "\uffff"))
+        for seq, collection, record_id in self.entries[start:]:
+            if limit is not None and len(changes) >= limit:
+                break
+            position = seq
+            if self.latest.get((collection, record_id)) != seq:
+                continue
+            if collections is not None and collection not in collections:
+                continue
+            changes.append((seq, collection, record_id))
+        else:
+            position = self.sequence
+        return changes, position
+
+
+class ChangeFeed:
+    """Fans repository changes out to subscribed dashboard clients as compact events"""
+
+    def __init__(self, repositories: dict, log: ChangeLog, buffer_size: int = 256):
+        self.repositories = repositories
+        self.log = log
+        self.buffer_size = buffer_size
+        self.subscriptions: Set[Subscription] = set()
+
+    def subscribe(self, collections: Optional[Iterable[str]] = None, ward: Optional[str] = None) -> Subscription:
+        subscription = Subscription(set(collections) if collections else None, ward, self.buffer_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    def close(self):
+        """Disconnect every client, e.g. on shutdown"""
+        for subscription in list(self.subscriptions):
+            subscription.close()
+        self.subscriptions.clear()
+
+    def on_change(self, collection: str, op: str, record: dict, previous: Optional[dict]):
+        """Repository listener: build one event and hand it to every interested client"""
+        repository = self.repositories[collection]
+        event = {
+            "type": "change",
+            "seq": self.log.append(collection, record["id"]),
+            "collection": collection,
+            "op": op,
+            "id": record["id"],
+        }
+        for column in EVENT_FIELDS:
+            event[column] = repository.field(record, column)
+        if previous is not None and previous.get("status") != event["status"]:
+            event["previous_status"] = previous.get("status")
+
+        for subscription in self.subscriptions:
+            if subscription.wants(event):
+                subscription.offer(event)
+
+
+def format_sse(event: dict) -> str:
+    """Encode an event in text/event-stream framing"""
+    lines = []
+    if "seq" in event:
+        lines.append(f"id: {event['seq']}")
+    lines.append(f"event: {event['type']}")
+    lines.append("data: " + json.dumps(event, ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
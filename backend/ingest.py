@@ -0,0 +1,200 @@
+import asyncio
+import json
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from detection import detect_illegal_constructions
+
+# Characters read from a drone file at a time; grows while a single ward does not fit
+INGEST_READ_SIZE = 1024 * 1024
+
+JSON_WHITESPACE = " \t\n\r"
+NUMBER_CHARACTERS = "0123456789+-.eE"
+
+
+def is_json_array(path: str) -> bool:
+    """Whether a JSON file holds an array at the top level, from its first characters"""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        while True:
+            chunk = f.read(4096)
+            if not chunk:
+                return False
+            stripped = chunk.lstrip(JSON_WHITESPACE)
+            if stripped:
+                return stripped[0] == "["
+
+
+def iter_json_array(path: str, read_size: int = INGEST_READ_SIZE) -> Iterator:
+    """Yield the elements of a top-level JSON array one at a time.
+
+    The file is read in chunks and each element is decoded as soon as it is
+    complete, so only one element (and the chunk around it) is in memory,
+    however large the file. Raises ValueError on malformed JSON.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8-sig") as f:
+        buffer = ""
+        while True:
+            chunk = f.read(read_size)
+            buffer = chunk.lstrip(JSON_WHITESPACE)
+            if buffer or not chunk:
+                break
+        if not buffer.startswith("["):
+            raise ValueError("Expected a JSON array")
+        position = 1
+        size = read_size
+        eof = False
+        expecting_value = True
+        first = True
+        # Length of the previous element: the wards of one export tend to be alike, so
+        # about that much is read before decoding the next one instead of retrying
+        expected = 0
+
+        while True:
+            while position < len(buffer) and buffer[position] in JSON_WHITESPACE:
+                position += 1
+
+            if position < len(buffer):
+                character = buffer[position]
+                if character == "]" and (first or not expecting_value):
+                    break
+                if not expecting_value:
+                    if character != ",":
+                        raise ValueError(f"Expected ',' or ']' in JSON array, got {character!r}")
+                    position += 1
+                    expecting_value = True
+                    continue
+                if not eof and len(buffer) - position < expected:
+                    chunk = f.read(expected - (len(buffer) - position) + read_size)
+                    eof = not chunk
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    continue
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # A number cut off by the end of the chunk ("12" of "12.5") may continue in the next one
+                    complete = eof or (end < len(buffer) and buffer[end] not in NUMBER_CHARACTERS)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    complete = False
+                if complete:
+                    yield value
+                    expected = end - position
+                    position = end
+                    expecting_value = False
+                    first = False
+                    size = read_size
+                    continue
+            elif eof:
+                raise ValueError("Unterminated JSON array")
+
+            # Keep the unread tail and append a larger chunk, so an element spanning
+            # many chunks is re-decoded only a logarithmic number of times
+            chunk = f.read(size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            size *= 2
+
+        # Only whitespace may follow the array
+        rest = buffer[position + 1:]
+        while True:
+            if rest.strip(JSON_WHITESPACE):
+                raise ValueError("Extra data after JSON array")
+            rest = f.read(read_size)
+            if not rest:
+                return
+
+
+class DetectionError(Exception):
+    """Violation detection failed for a ward; the survey must not be stored as compliant"""
+
+
+def analyze_ward(ward: dict, rules, engine: str) -> List[dict]:
+    """Violations of one ward; runs in a worker process"""
+    try:
+        return detect_illegal_constructions(ward, rules, engine=engine)
+    except Exception as e:
+        # Only the message survives the trip back from the worker process
+        raise DetectionError(f"Detection failed for ward {ward.get('ward_no')}: {type(e).__name__}: {e}") from e
+
+
+class DetectionPool:
+    """Worker processes running violation detection for the wards of multi-ward drone files.
+
+    Wards are submitted as they are parsed, with at most two per worker in
+    flight, and handed to a callback as soon as their check finishes, so only
+    the wards in flight are ever held in memory and detection for one ward
+    overlaps parsing of the next. Without a started pool (the app
+    imported without its lifespan) detection runs in a thread instead.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self.workers > 0:
+            # Never fork the server itself: a lock held by one of its threads would stay
+            # held in the child. A forkserver starts workers from a clean process
+            # that has already imported this module; spawn where there is none.
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            context = multiprocessing.get_context(method)
+            if method == "forkserver":
+                context.set_forkserver_preload([__name__])
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    async def analyze(self, wards: Iterator[Tuple[Any, dict]], rules, engine: str,
+                      on_result: Callable[[Any, dict, List[dict]], None],
+                      on_progress: Optional[Callable[[int], None]] = None) -> int:
+        """Check ``(key, ward)`` pairs and return how many were analyzed.
+
+        ``on_result(key, ward, violations)`` is called on the event loop for
+        every ward, in order, as soon as it is checked; the ward is dropped
+        afterwards. A ward whose detection fails raises DetectionError. ``wards`` is advanced in a thread, so it can parse a file
+        as it goes; errors it raises are passed on once the wards in flight
+        are done. ``on_progress`` is called with the number of wards analyzed
+        so far.
+        """
+        loop = asyncio.get_running_loop()
+        done = object()
+        window = max(1, self.workers) * 2
+        pending = deque()
+        count = 0
+        try:
+            while True:
+                item = await asyncio.to_thread(next, wards, done)
+                if item is done:
+                    break
+                key, ward = item
+                if self.executor is not None:
+                    future = loop.run_in_executor(self.executor, analyze_ward, ward, rules, engine)
+                else:
+                    future = asyncio.ensure_future(asyncio.to_thread(analyze_ward, ward, rules, engine))
+                pending.append((key, ward, future))
+                if len(pending) >= window:
+                    key, ward, future = pending.popleft()
+                    on_result(key, ward, await future)
+                    count += 1
+                    # Not kept alive while the next ward is parsed
+                    ward = None
+                    if on_progress is not None:
+                        on_progress(count)
+        finally:
+            if pending:
+                await asyncio.gather(*(future for _, _, future in pending), return_exceptions=True)
+        while pending:
+            key, ward, future = pending.popleft()
+            on_result(key, ward, future.result())
+            count += 1
+        if on_progress is not None:
+            on_progress(count)
+        return count
+
+    async def stop(self):
+        if self.executor is not None:
+            await asyncio.to_thread(self.executor.shutdown, True)
+            self.executor = None
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+# Fields of a job returned by the status API
+JOB_FIELDS = ("id", "type", "status", "created_at", "started_at", "finished_at", "progress", "result", "error")
+
+
+class JobQueue:
+    """Background jobs run by a fixed number of worker tasks, off the request path.
+
+    ``submit()`` queues a job and returns at once; at most ``max_queued`` jobs
+    wait at a time, beyond that submissions are refused with 503 so a burst
+    of uploads cannot pile up unbounded work. Jobs live in memory and finished
+    ones are forgotten after ``retention_hours``. A runner reports its stage
+    in ``progress["stage"]``; once the job ends the stage is ``"done"`` or
+    ``"failed"``.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 100, retention_hours: float = 24):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = timedelta(hours=retention_hours)
+        self.jobs: Dict[str, dict] = {}
+        self.runners: Dict[str, Tuple[Callable[[dict], Awaitable[dict]], Optional[Callable[[], None]]]] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def submit(self, job_id: str, job_type: str, run: Callable[[dict], Awaitable[dict]],
+               cancel: Optional[Callable[[], None]] = None) -> dict:
+        """Queue ``run(job)``; its return value becomes the job's result.
+
+        ``cancel`` is called instead if the job is dropped before it starts.
+        """
+        if self.queue is None:
+            raise HTTPException(status_code=503, detail="Background processing is not running")
+        self.prune()
+        if self.queue.qsize() >= self.max_queued:
+            raise HTTPException(status_code=503, detail="Too many jobs waiting, try again later", headers={"Retry-After": "30"})
+
+        job = {
+            "id": job_id,
+            "type": job_type,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {},
+            "result": None,
+            "error": None,
+        }
+        self.jobs[job_id] = job
+        self.runners[job_id] = (run, cancel)
+        self.queue.put_nowait(job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.jobs.get(job_id)
+
+    def describe(self, job: dict) -> dict:
+        """Public view of a job, with its place in the queue while it waits"""
+        described = {field: job[field] for field in JOB_FIELDS}
+        if job["status"] == "queued":
+            described["queued_ahead"] = sum(
+                1 for other in self.jobs.values()
+                if other["status"] == "queued" and other["created_at"] < job["created_at"]
+            )
+        return described
+
+    def prune(self):
+        """Forget finished jobs older than the retention period"""
+        cutoff = (datetime.now() - self.retention).isoformat()
+        for job_id in [job_id for job_id, job in self.jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self.jobs[job_id]
+
+    async def _work(self):
+        queue = self.queue
+        while True:
+            job_id = await queue.get()
+            job = self.jobs.get(job_id)
+            run, _ = self.runners.pop(job_id, (None, None))
+            try:
+                if job is None or run is None:
+                    continue
+                job["status"] = "running"
+                job["started_at"] = datetime.now().isoformat()
+                try:
+                    job["result"] = await run(job)
+                    job["status"] = "completed"
+                except HTTPException as e:
+                    job["status"] = "failed"
+                    job["error"] = e.detail
+                except Exception as e:
+                    print(f"Error in {job['type']} job {job_id}: {e}")
+                    job["status"] = "failed"
+                    job["error"] = str(e)
+                finally:
+                    job["progress"]["stage"] = "done" if job["status"] == "completed" else "failed"
+                    job["finished_at"] = datetime.now().isoformat()
+            finally:
+                queue.task_done()
+
+    async def stop(self):
+        """Let running jobs finish; jobs still waiting are dropped and marked failed"""
+        if self.queue is None:
+            return
+        queue, self.queue = self.queue, None
+        while not queue.empty():
+            job_id = queue.get_nowait()
+            _, cancel = self.runners.pop(job_id, (None, None))
+            job = self.jobs[job_id]
+            job["status"] = "failed"
+            job["error"] = "Server shut down before the job started"
+            job["progress"]["stage"] = "failed"
+            job["finished_at"] = datetime.now().isoformat()
+            if cancel is not None:
+                cancel()
+            queue.task_done()
+        await queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
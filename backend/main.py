@@ -1,16 +1,45 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
 import json
-import shutil
-from datetime import datetime
+import asyncio
+from datetime import date, datetime
 from typing import List, Optional
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-app = FastAPI(title="Garun System Backend", version="1.0.0")
+from analytics import GRANULARITIES, DashboardAnalytics, TrendRollups, period_count, periods_back
+from caching import VersionedResponseCache
+from dedup import CLOSED_STATUSES, DuplicateIndex
+from detection import validate_and_clean_survey_data
+from events import ChangeFeed, ChangeLog, format_sse
+from ingest import DetectionError, DetectionPool, is_json_array, iter_json_array
+from jobs import JobQueue
+from media import MediaPipeline, is_image
+from rulesets import RegulationRegistry
+from search import SearchIndex
+from spatial import GeoGrid
+from storage import JsonStore, SqliteStore, decode_cursor
+from streaming import NDJSON_MEDIA_TYPE, stream_json_object, stream_ndjson
+from uploads import ContentStore, RequestSizeLimit, UploadBatch, UploadSessions, serve_upload
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the storage backend's background writer for the lifetime of the app"""
+    store.start()
+    media_pipeline.start()
+    detection_pool.start()
+    survey_jobs.start()
+    yield
+    change_feed.close()
+    await survey_jobs.stop()
+    await detection_pool.stop()
+    await media_pipeline.stop()
+    await store.stop()
+
+app = FastAPI(title="Garun System Backend", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -21,6 +50,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Upload size limits in bytes: any single file, and all files of one request together
+MAX_UPLOAD_FILE_SIZE = int(os.getenv("MAX_UPLOAD_FILE_SIZE", str(100 * 1024 * 1024)))
+MAX_UPLOAD_REQUEST_SIZE = int(os.getenv("MAX_UPLOAD_REQUEST_SIZE", str(250 * 1024 * 1024)))
+
+# Bodies are counted as they arrive, so chunked requests without a
+# Content-Length are held to the same limit
+app.add_middleware(RequestSizeLimit, max_size=MAX_UPLOAD_REQUEST_SIZE)
+
 # Create necessary directories
 UPLOAD_DIR = Path("uploads")
 COMPLAINTS_DIR = UPLOAD_DIR / "complaints"
@@ -32,15 +69,42 @@ SURVEYS_DIR = UPLOAD_DIR / "surveys"
 for directory in [UPLOAD_DIR, COMPLAINTS_DIR, PROPERTY_DIR, BUILDING_DIR, ADMIN_DIR, SURVEYS_DIR]:
     directory.mkdir(exist_ok=True)
 
-# Mount static files
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# New uploads are stored once per distinct content under uploads/objects/;
+# the per-type directories above hold files uploaded before that
+upload_store = ContentStore(UPLOAD_DIR / "objects")
+
+# Resumable uploads in progress, kept under uploads/sessions/ for UPLOAD_SESSION_TTL_HOURS
+UPLOAD_SESSION_TTL_HOURS = float(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+upload_sessions = UploadSessions(UPLOAD_DIR / "sessions", upload_store, MAX_UPLOAD_FILE_SIZE, UPLOAD_SESSION_TTL_HOURS)
+
+# Violation detection engine: "auto" evaluates large surveys column-wise with NumPy
+# (when installed), "scalar" and "columnar" force one engine
+DETECTION_ENGINE = os.getenv("DETECTION_ENGINE", "auto")
+
+# Building regulations: one JSON file per version under regulations/, compiled
+# once and reloaded when a file changes. New surveys are checked against
+# REGULATION_VERSION and store only its id.
+REGULATION_DIR = Path(os.getenv("REGULATION_DIR", "regulations"))
+REGULATION_VERSION = os.getenv("REGULATION_VERSION", "indore-2025-v1")
+regulation_registry = RegulationRegistry(REGULATION_DIR, REGULATION_VERSION)
+regulation_registry.load()
+
+# Drone files holding an array of wards are parsed incrementally and each ward is
+# checked in one of SURVEY_WORKERS worker processes
+SURVEY_WORKERS = int(os.getenv("SURVEY_WORKERS", str(min(4, os.cpu_count() or 1))))
+detection_pool = DetectionPool(SURVEY_WORKERS)
+
+# Surveys submitted to /api/surveys/jobs run in the background, SURVEY_JOB_WORKERS at a
+# time; beyond SURVEY_JOB_QUEUE_SIZE waiting jobs new submissions get 503
+SURVEY_JOB_WORKERS = int(os.getenv("SURVEY_JOB_WORKERS", "2"))
+SURVEY_JOB_QUEUE_SIZE = int(os.getenv("SURVEY_JOB_QUEUE_SIZE", "100"))
+survey_jobs = JobQueue(SURVEY_JOB_WORKERS, SURVEY_JOB_QUEUE_SIZE)
+
+# Thumbnails, previews and size-bounded copies of uploaded images, generated in
+# the background by MEDIA_WORKERS threads and stored under uploads/derived/
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+media_pipeline = MediaPipeline(UPLOAD_DIR / "derived", workers=MEDIA_WORKERS)
 
-# Data storage (in-memory for now, in production use a database)
-complaints_db = []
-property_verifications_db = []
-building_approvals_db = []
-surveys_db = []
-illegal_constructions_db = []
 admin_data = {
     "complaints": [],
     "property_verifications": [],
@@ -60,321 +124,316 @@ PROPERTY_FILE = DATA_DIR / "property_verifications.json"
 BUILDING_FILE = DATA_DIR / "building_approvals.json"
 SURVEYS_FILE = DATA_DIR / "surveys.json"
 ILLEGAL_FILE = DATA_DIR / "illegal_constructions.json"
+SQLITE_FILE = DATA_DIR / "garun.db"
+
+# Storage backend: "json" keeps every collection in memory backed by the files
+# above, "sqlite" keeps them in an embedded SQLite database (data/garun.db) and
+# imports the JSON files the first time it starts
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+# JSON storage mode: "journal" appends each changed record to data/<collection>.journal,
+# "snapshot" rewrites the changed collection's data file on each save
+STORAGE_MODE = os.getenv("STORAGE_MODE", "journal")
+# Fold a journal back into its snapshot once it holds this many entries
+JOURNAL_COMPACT_AFTER = int(os.getenv("JOURNAL_COMPACT_AFTER", "1000"))
+# Background writer: flush queued changes every PERSIST_FLUSH_INTERVAL seconds or
+# once PERSIST_MAX_PENDING records are waiting. DURABLE_WRITES makes handlers wait
+# for their records to reach disk before responding.
+PERSIST_FLUSH_INTERVAL = float(os.getenv("PERSIST_FLUSH_INTERVAL", "0.05"))
+PERSIST_MAX_PENDING = int(os.getenv("PERSIST_MAX_PENDING", "256"))
+DURABLE_WRITES = os.getenv("DURABLE_WRITES", "false").lower() == "true"
 
 # Create data directory
 DATA_DIR.mkdir(exist_ok=True)
 
+if STORAGE_BACKEND == "sqlite":
+    store = SqliteStore(SQLITE_FILE, durable=DURABLE_WRITES)
+else:
+    store = JsonStore(
+        mode=STORAGE_MODE,
+        compact_after=JOURNAL_COMPACT_AFTER,
+        interval=PERSIST_FLUSH_INTERVAL,
+        max_pending=PERSIST_MAX_PENDING,
+        durable=DURABLE_WRITES,
+    )
+
+# Data storage: one repository per collection. The field maps name where each
+# indexed column (contact_number, ward, status, severity, submitted_at, category)
+# lives; submitted_at is the submission or creation time used for pagination.
+complaints_db = store.repository("complaints", COMPLAINTS_FILE, {
+    "contact_number": "complainant.contact_number",
+    "ward": "ward",
+    "status": "status",
+    "submitted_at": "submitted_at",
+    "category": "category",
+})
+property_verifications_db = store.repository("property_verifications", PROPERTY_FILE, {
+    "contact_number": "contact_number",
+    "ward": "ward",
+    "status": "status",
+    "submitted_at": "submitted_at",
+    "category": "document_type",
+})
+building_approvals_db = store.repository("building_approvals", BUILDING_FILE, {
+    "contact_number": "contact_number",
+    "ward": "ward",
+    "status": "status",
+    "submitted_at": "submitted_at",
+    "category": "property_type",
+})
+surveys_db = store.repository("surveys", SURVEYS_FILE, {
+    "ward": "ward_no",
+    "status": "status",
+    "submitted_at": "created_at",
+    "category": "survey_type",
+})
+illegal_constructions_db = store.repository("illegal_constructions", ILLEGAL_FILE, {
+    "ward": "ward_no",
+    "status": "status",
+    "severity": "severity",
+    "submitted_at": "detected_at",
+    "category": "violation_type",
+})
+
+# Dashboard analytics kept up to date from every survey and violation change
+dashboard_analytics = DashboardAnalytics()
+surveys_db.subscribe(dashboard_analytics.on_change)
+illegal_constructions_db.subscribe(dashboard_analytics.on_change)
+
+# Day, week and month rollups of complaints, violations and resolution times
+# behind /api/analytics/timeseries
+trend_rollups = TrendRollups()
+complaints_db.subscribe(trend_rollups.on_change)
+illegal_constructions_db.subscribe(trend_rollups.on_change)
+
+# Live change events pushed to dashboards over /api/events/stream
+COLLECTIONS = {
+    repository.name: repository
+    for repository in (complaints_db, property_verifications_db, building_approvals_db,
+                       surveys_db, illegal_constructions_db)
+}
+# Events buffered per client before the oldest are dropped, and seconds between keep-alives
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "256"))
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+# Changes kept for /api/sync/changes; clients further behind must resync in full
+CHANGE_LOG_SIZE = int(os.getenv("CHANGE_LOG_SIZE", "10000"))
+change_log = ChangeLog(capacity=CHANGE_LOG_SIZE)
+change_feed = ChangeFeed(COLLECTIONS, change_log, buffer_size=EVENT_BUFFER_SIZE)
+for repository in COLLECTIONS.values():
+    repository.subscribe(change_feed.on_change)
+
+# Locations of complaints, surveys and violations in a grid index for the /api/geo
+# queries; GEO_CELL_DEGREES is the cell size (0.01 degrees is about 1.1 km)
+SPATIAL_COLLECTIONS = ("complaints", "surveys", "illegal_constructions")
+GEO_CELL_DEGREES = float(os.getenv("GEO_CELL_DEGREES", "0.01"))
+geo_index = GeoGrid(GEO_CELL_DEGREES)
+for name in SPATIAL_COLLECTIONS:
+    COLLECTIONS[name].subscribe(geo_index.on_change)
+
+# Near-duplicate detection for new complaints: complaints of the same category
+# within DEDUP_CELL_DEGREES (0.002 degrees is about 220 m) whose title and
+# description reach DEDUP_SIMILARITY are linked to the earlier complaint's
+# cluster, looking back DEDUP_WINDOW_HOURS
+DEDUP_WINDOW_HOURS = float(os.getenv("DEDUP_WINDOW_HOURS", "72"))
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.5"))
+DEDUP_CELL_DEGREES = float(os.getenv("DEDUP_CELL_DEGREES", "0.002"))
+duplicate_index = DuplicateIndex(DEDUP_WINDOW_HOURS, DEDUP_SIMILARITY, DEDUP_CELL_DEGREES)
+complaints_db.subscribe(duplicate_index.on_change)
+
+# Full-text search over complaints, verifications and approvals for /api/search;
+# each field's weight multiplies the count of its terms
+SEARCH_FIELDS = {
+    "complaints": {"title": 2.0, "description": 1.0, "address": 1.0, "landmark": 1.0},
+    "property_verifications": {"citizen": 2.0, "permanent_address": 1.0},
+    "building_approvals": {"applicant": 2.0, "property_address": 1.0, "project": 1.0},
+}
+search_index = SearchIndex(COLLECTIONS, SEARCH_FIELDS)
+for name in SEARCH_FIELDS:
+    COLLECTIONS[name].subscribe(search_index.on_change)
+
+# Encoded GET responses, reused while the collections they read are unchanged;
+# RESPONSE_CACHE_MB bounds the memory the kept bodies take
+RESPONSE_CACHE_MB = float(os.getenv("RESPONSE_CACHE_MB", "64"))
+response_cache = VersionedResponseCache(int(RESPONSE_CACHE_MB * 1024 * 1024))
+
 # Load data from files if they exist
 def load_data():
-    """Load data from JSON files"""
-    global complaints_db, property_verifications_db, building_approvals_db, surveys_db, illegal_constructions_db
-    
+    """Load every collection from the configured storage backend"""
     try:
-        if COMPLAINTS_FILE.exists():
-            with open(COMPLAINTS_FILE, 'r', encoding='utf-8') as f:
-                complaints_db = json.load(f)
-        
-        if PROPERTY_FILE.exists():
-            with open(PROPERTY_FILE, 'r', encoding='utf-8') as f:
-                property_verifications_db = json.load(f)
-        
-        if BUILDING_FILE.exists():
-            with open(BUILDING_FILE, 'r', encoding='utf-8') as f:
-                building_approvals_db = json.load(f)
-        
-        if SURVEYS_FILE.exists():
-            with open(SURVEYS_FILE, 'r', encoding='utf-8') as f:
-                surveys_db = json.load(f)
-        
-        if ILLEGAL_FILE.exists():
-            with open(ILLEGAL_FILE, 'r', encoding='utf-8') as f:
-                illegal_constructions_db = json.load(f)
-                
+        store.load()
+        dashboard_analytics.rebuild(surveys_db, illegal_constructions_db)
+        trend_rollups.rebuild(complaints_db, illegal_constructions_db)
+        geo_index.rebuild({name: COLLECTIONS[name] for name in SPATIAL_COLLECTIONS})
+        duplicate_index.rebuild(complaints_db)
+        search_index.rebuild()
+        upload_store.rebuild(record for repository in COLLECTIONS.values() for record in repository)
+        upload_sessions.restore()
         print(f"Loaded {len(complaints_db)} complaints, {len(property_verifications_db)} property verifications, {len(building_approvals_db)} building approvals")
     except Exception as e:
         print(f"Error loading data: {e}")
-        # Initialize empty lists if loading fails
-        complaints_db = []
-        property_verifications_db = []
-        building_approvals_db = []
-        surveys_db = []
-        illegal_constructions_db = []
 
 def save_data():
-    """Save data to JSON files"""
+    """Write full snapshots of every collection (JSON) or checkpoint the database (SQLite)"""
     try:
-        with open(COMPLAINTS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(complaints_db, f, indent=2, ensure_ascii=False)
-        
-        with open(PROPERTY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(property_verifications_db, f, indent=2, ensure_ascii=False)
-        
-        with open(BUILDING_FILE, 'w', encoding='utf-8') as f:
-            json.dump(building_approvals_db, f, indent=2, ensure_ascii=False)
-        
-        with open(SURVEYS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(surveys_db, f, indent=2, ensure_ascii=False)
-        
-        with open(ILLEGAL_FILE, 'w', encoding='utf-8') as f:
-            json.dump(illegal_constructions_db, f, indent=2, ensure_ascii=False)
-            
+        store.save()
         print("Data saved successfully")
     except Exception as e:
         print(f"Error saving data: {e}")
 
-# Load data on startup
-load_data()
+# Load data on startup (not in detection worker processes, which re-import the
+# main module as __mp_main__ when it is the script being run)
+if __name__ != "__mp_main__":
+    load_data()
 
 # Helper functions
 def generate_id(prefix: str) -> str:
     """Generate unique ID with prefix"""
     return f"{prefix}{datetime.now().strftime('%Y%m%d%H%M%S')}{str(uuid.uuid4())[:8]}"
 
-def save_file(file: UploadFile, directory: Path) -> str:
-    """Save uploaded file and return filename"""
-    if not file:
-        return ""
+def read_json_file(path: str):
+    """Parse a stored JSON file"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def split_ids(value: Optional[str]) -> List[str]:
+    """Comma-separated ids from a form field"""
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+def new_upload_batch() -> UploadBatch:
+    """Collects the files saved by one request, enforcing the configured size limits"""
+    return UploadBatch(upload_store, MAX_UPLOAD_FILE_SIZE, MAX_UPLOAD_REQUEST_SIZE)
+
+def merge_survey_metadata(data: dict, survey_json: dict) -> dict:
+    """Fill in essential survey metadata from the form where drone data lacks it"""
+    for field in ("ward_no", "survey_date", "drone_id", "coordinates"):
+        if field not in data:
+            data[field] = survey_json.get(field)
+    return data
+
+def drone_wards(path: str, survey_json: dict):
+    """(index in the file, ward) of a multi-ward drone file, parsed one at a time"""
+    for index, ward in enumerate(iter_json_array(path)):
+        if not isinstance(ward, dict):
+            print(f"Warning: Skipping entry {index} of drone data file '{path}': not a JSON object")
+            continue
+        # Cleaned here as well as in the worker, so the stored copy matches what was checked
+        validate_and_clean_survey_data(merge_survey_metadata(ward, survey_json))
+        yield index, ward
+
+async def process_complaint_media(complaint_id: str, sources: List[str]):
+    """Generate derivatives of a complaint's images and record them under files.derivatives"""
+    results = await asyncio.gather(*(media_pipeline.derive(source) for source in sources))
+    derivatives = {source: result for source, result in zip(sources, results) if result}
+    if not derivatives:
+        return
     
-    # Create unique filename
-    file_extension = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = directory / unique_filename
+    complaint = complaints_db.get(complaint_id)
+    if not complaint:
+        return
+    complaint["files"]["derivatives"] = {**complaint["files"].get("derivatives", {}), **derivatives}
+    await complaints_db.update(complaint)
+
+class CollectionQuery:
+    """Filter, sort and pagination parameters shared by the /all endpoints"""
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    def __init__(
+        self,
+        status: Optional[str] = None,
+        ward: Optional[str] = None,
+        category: Optional[str] = None,
+        severity: Optional[str] = None,
+        date_from: Optional[str] = Query(None, description="Earliest submission/creation date (inclusive)"),
+        date_to: Optional[str] = Query(None, description="Latest submission/creation date (inclusive)"),
+        sort: str = Query("submitted_at", pattern="^-?submitted_at$", description="submitted_at or -submitted_at"),
+        cursor: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1, le=500),
+        stream: Optional[str] = Query(None, pattern="^(json|ndjson)$", description="Stream the records as json or ndjson")
+    ):
+        self.filters = {
+            column: value
+            for column, value in (("status", status), ("ward", ward), ("category", category), ("severity", severity))
+            if value is not None
+        }
+        self.date_from = date_from
+        self.date_to = date_to
+        self.descending = sort.startswith("-")
+        self.cursor = cursor
+        self.limit = limit
+        self.stream = stream
     
-    return str(file_path)
+    @property
+    def paginated(self) -> bool:
+        return self.limit is not None or self.cursor is not None
 
-def update_admin_data():
-    """Update admin dashboard data"""
-    admin_data["complaints"] = complaints_db
-    admin_data["property_verifications"] = property_verifications_db
-    admin_data["building_approvals"] = building_approvals_db
-    admin_data["surveys"] = surveys_db
-    admin_data["illegal_constructions"] = illegal_constructions_db
+def iter_query(repository, query: CollectionQuery, page_size: int = 500):
+    """Yield every record matching a query, one page at a time"""
+    cursor = query.cursor
+    while True:
+        records, cursor = repository.query(query.filters, query.date_from, query.date_to,
+                                           query.descending, cursor, page_size)
+        yield from records
+        if cursor is None:
+            return
 
-def validate_and_clean_survey_data(survey_data):
-    """Validate and clean survey data to ensure proper types"""
-    if not isinstance(survey_data, dict):
-        print("Warning: survey_data is not a dictionary")
-        return None
+def list_collection(request: Request, repository, key: str, query: CollectionQuery):
+    """Response for an /all endpoint.
     
-    # Ensure buildings array exists and is a list
-    if "buildings" not in survey_data:
-        survey_data["buildings"] = []
-    elif not isinstance(survey_data["buildings"], list):
-        survey_data["buildings"] = []
-    
-    # Ensure roads array exists and is a list
-    if "roads" not in survey_data:
-        survey_data["roads"] = []
-    elif not isinstance(survey_data["roads"], list):
-        survey_data["roads"] = []
-    
-    # Ensure land_usage object exists
-    if "land_usage" not in survey_data:
-        survey_data["land_usage"] = {}
-    elif not isinstance(survey_data["land_usage"], dict):
-        survey_data["land_usage"] = {}
-    
-    return survey_data
-
-def detect_illegal_constructions(survey_data, regulations):
-    """Detect illegal constructions based on survey data and regulations"""
-    violations = []
-    
-    # Validate and clean survey data
-    survey_data = validate_and_clean_survey_data(survey_data)
-    if survey_data is None:
-        print("Warning: Invalid survey data, skipping validation")
-        return violations
-    
-    # Check building violations
-    for building in survey_data.get("buildings", []):
-        building_type = building.get("type", "residential")
-        zone_regulations = regulations["zones"].get(building_type, regulations["zones"]["residential"])
-        
-        # Convert string values to float/int for comparison with error handling
-        try:
-            height_meters = float(building.get("height_meters", 0) or 0)
-            floors = int(building.get("floors", 0) or 0)
-            area_sq_meters = float(building.get("area_sq_meters", 0) or 0)
-            
-            # Debug logging
-            print(f"Processing building: height={height_meters}, floors={floors}, area={area_sq_meters}")
-            
-        except (ValueError, TypeError) as e:
-            print(f"Warning: Failed to convert building data for building {building.get('building_id', 'unknown')}: {e}")
-            # Skip this building if conversion fails
-            continue
-        
-        # Height violations
-        height_limit = zone_regulations["building_regulations"]["building_height_limit_meters"]
-        print(f"Comparing height: {height_meters} (type: {type(height_meters)}) > {height_limit} (type: {type(height_limit)})")
-        if height_meters > height_limit:
-            violations.append({
-                "building_id": building.get("building_id"),
-                "type": "height_violation",
-                "current": height_meters,
-                "allowed": zone_regulations["building_regulations"]["building_height_limit_meters"],
-                "severity": "high",
-                "description": f"Building height {height_meters}m exceeds limit of {zone_regulations['building_regulations']['building_height_limit_meters']}m for {building_type} zone"
-            })
-        
-        # Floor violations
-        max_floors_limit = zone_regulations["building_regulations"]["max_floors"]
-        print(f"Comparing floors: {floors} (type: {type(floors)}) > {max_floors_limit} (type: {type(max_floors_limit)})")
-        if floors > max_floors_limit:
-            violations.append({
-                "building_id": building.get("building_id"),
-                "type": "floor_violation",
-                "current": floors,
-                "allowed": zone_regulations["building_regulations"]["max_floors"],
-                "severity": "high",
-                "description": f"Building has {floors} floors, exceeding limit of {zone_regulations['building_regulations']['max_floors']} for {building_type} zone"
-            })
-        
-        # FAR violations (Floor Area Ratio)
-        if floors > 0 and area_sq_meters > 0:
-            plot_area = area_sq_meters / floors
-            far = area_sq_meters / plot_area if plot_area > 0 else 0
-            far_limit = zone_regulations["building_regulations"]["floor_area_ratio"]
-            print(f"Comparing FAR: {far} (type: {type(far)}) > {far_limit} (type: {type(far_limit)})")
-            if far > far_limit:
-                violations.append({
-                    "building_id": building.get("building_id"),
-                    "type": "far_violation",
-                    "current": round(far, 2),
-                    "allowed": zone_regulations["building_regulations"]["floor_area_ratio"],
-                    "severity": "medium",
-                    "description": f"FAR {round(far, 2)} exceeds limit of {zone_regulations['building_regulations']['floor_area_ratio']} for {building_type} zone"
-                })
-        
-        # Setback violations (if setback data is provided)
-        setbacks = building.get("setbacks", {})
-        if setbacks:
+    Without limit or cursor every matching record is returned as before; with
+    them one page is returned along with the cursor of the next page. With
+    stream=ndjson or stream=json the matching records are encoded and sent as
+    they are read instead of being collected into one response body. Other
+    responses carry an ETag and are served from response_cache while the
+    collection is unchanged.
+    """
+    if query.stream:
+        if query.cursor:
             try:
-                front_setback = float(setbacks.get("front_setback_meters", 0) or 0)
-                required_front = zone_regulations["building_regulations"]["setbacks"]["front_setback_meters"]
-                print(f"Comparing setback: {front_setback} (type: {type(front_setback)}) < {required_front} (type: {type(required_front)})")
-                if front_setback < required_front:
-                    violations.append({
-                        "building_id": building.get("building_id"),
-                        "type": "setback_violation",
-                        "current": front_setback,
-                        "allowed": required_front,
-                        "severity": "medium",
-                        "description": f"Front setback {front_setback}m is less than required {required_front}m for {building_type} zone"
-                    })
-            except (ValueError, TypeError):
-                # Skip setback validation if conversion fails
-                pass
-    
-    # Check road violations
-    for road in survey_data.get("roads", []):
-        road_type = road.get("surface_type", "asphalt")
-        min_width = 9 if road_type in ["asphalt", "concrete"] else 6
-        
-        # Convert string values to float for comparison with error handling
-        try:
-            width_meters = float(road.get("width_meters", 0) or 0)
-            length_meters = float(road.get("length_meters", 0) or 0)
-            
-            # Debug logging
-            print(f"Processing road: width={width_meters}, length={length_meters}")
-            
-        except (ValueError, TypeError) as e:
-            print(f"Warning: Failed to convert road data for road {road.get('road_id', 'unknown')}: {e}")
-            # Skip this road if conversion fails
-            continue
-        
-        print(f"Comparing road width: {width_meters} (type: {type(width_meters)}) < {min_width} (type: {type(min_width)})")
-        if width_meters < min_width:
-            violations.append({
-                "road_id": road.get("road_id"),
-                "type": "road_width_violation",
-                "current": width_meters,
-                "allowed": min_width,
-                "severity": "medium",
-                "description": f"Road width {width_meters}m is less than minimum {min_width}m for {road_type} surface"
-            })
-        
-        # Check road length for very short roads (potential encroachment)
-        print(f"Comparing road length: {length_meters} (type: {type(length_meters)}) < 5")
-        if length_meters < 5:
-            violations.append({
-                "road_id": road.get("road_id"),
-                "type": "road_encroachment_suspicion",
-                "current": length_meters,
-                "allowed": 5,
-                "severity": "low",
-                "description": f"Road length {length_meters}m is suspiciously short, possible encroachment"
-            })
+                decode_cursor(query.cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        records = iter_query(repository, query)
+        if query.stream == "ndjson":
+            return StreamingResponse(stream_ndjson(records), media_type=NDJSON_MEDIA_TYPE)
+        return StreamingResponse(
+            stream_json_object({"success": True}, {key: records}, total_key="total"),
+            media_type="application/json"
+        )
     
-    # Check land usage violations
-    land_usage = survey_data.get("land_usage", {})
+    return response_cache.respond(request, (repository.version,), lambda: collection_page(repository, key, query))
+
+def collection_page(repository, key: str, query: CollectionQuery) -> dict:
+    """Body of a non-streaming /all response"""
+    if not query.paginated:
+        if query.filters or query.date_from or query.date_to or query.descending:
+            records, _ = repository.query(query.filters, query.date_from, query.date_to,
+                                          query.descending, limit=max(len(repository), 1))
+        else:
+            records = repository.all()
+        return {
+            "success": True,
+            key: records,
+            "total": len(records)
+        }
     
-    # Convert string values to float for land usage calculations with error handling
     try:
-        residential_area = float(land_usage.get("residential_area_sq_meters", 0) or 0)
-        commercial_area = float(land_usage.get("commercial_area_sq_meters", 0) or 0)
-        industrial_area = float(land_usage.get("industrial_area_sq_meters", 0) or 0)
-        green_area = float(land_usage.get("green_area_sq_meters", 0) or 0)
-        
-        total_area = residential_area + commercial_area + industrial_area
-        
-        # Debug logging
-        print(f"Land usage: residential={residential_area}, commercial={commercial_area}, industrial={industrial_area}, green={green_area}, total={total_area}")
-        
-        if total_area > 0:
-            green_area_percent = (green_area / total_area) * 100
-            min_green_area = 10  # Default minimum
-            
-            # Adjust based on zone type if available
-            if survey_data.get("zone_type") == "commercial":
-                min_green_area = 5
-            elif survey_data.get("zone_type") == "industrial":
-                min_green_area = 8
-            
-            print(f"Comparing green area: {green_area_percent} (type: {type(green_area_percent)}) < {min_green_area} (type: {type(min_green_area)})")
-            if green_area_percent < min_green_area:
-                violations.append({
-                    "type": "green_area_violation",
-                    "current": round(green_area_percent, 2),
-                    "allowed": min_green_area,
-                    "severity": "low",
-                    "description": f"Green area {round(green_area_percent, 2)}% is less than minimum {min_green_area}% requirement"
-                })
-            
-            # Check for excessive commercial/industrial area in residential zones
-            if survey_data.get("zone_type") == "residential":
-                commercial_percent = (commercial_area / total_area) * 100
-                print(f"Comparing commercial area: {commercial_percent} (type: {type(commercial_percent)}) > 20")
-                if commercial_percent > 20:  # Max 20% commercial in residential zone
-                    violations.append({
-                        "type": "zone_misuse_violation",
-                        "current": round(commercial_percent, 2),
-                        "allowed": 20,
-                        "severity": "high",
-                        "description": f"Commercial area {round(commercial_percent, 2)}% exceeds 20% limit in residential zone"
-                    })
-    except (ValueError, TypeError) as e:
-        print(f"Warning: Failed to convert land usage data: {e}")
-        # Skip land usage validation if conversion fails
-        pass
-    
-    # Check for missing essential data
-    if not survey_data.get("buildings") and not survey_data.get("roads"):
-        violations.append({
-            "type": "data_incomplete_violation",
-            "current": "No buildings or roads data",
-            "allowed": "Complete survey data required",
-            "severity": "medium",
-            "description": "Survey data is incomplete - missing buildings and roads information"
-        })
+        records, next_cursor = repository.query(query.filters, query.date_from, query.date_to,
+                                                query.descending, query.cursor, query.limit or 50)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return violations
+    return {
+        "success": True,
+        key: records,
+        "count": len(records),
+        "next_cursor": next_cursor
+    }
+
+def update_admin_data():
+    """Update admin dashboard data"""
+    admin_data["complaints"] = complaints_db
+    admin_data["property_verifications"] = property_verifications_db
+    admin_data["building_approvals"] = building_approvals_db
+    admin_data["surveys"] = surveys_db
+    admin_data["illegal_constructions"] = illegal_constructions_db
 
 # Complaint endpoints
 @app.post("/api/complaints/register")
@@ -404,38 +463,23 @@ async def register_complaint(
     videos: List[UploadFile] = File([]),
     documents: List[UploadFile] = File([]),
     id_proof_document: Optional[UploadFile] = File(None),
-    selfie: Optional[UploadFile] = File(None)
+    selfie: Optional[UploadFile] = File(None),
+    video_upload_ids: Optional[str] = Form(None)  # Comma-separated ids of completed resumable uploads
 ):
     """Register a new complaint"""
+    uploads = new_upload_batch()
     try:
         complaint_id = generate_id("GRV")
         
-        # Save uploaded files
-        photo_paths = []
-        for photo in photos:
-            if photo:
-                photo_path = save_file(photo, COMPLAINTS_DIR)
-                photo_paths.append(photo_path)
-        
-        video_paths = []
-        for video in videos:
-            if video:
-                video_path = save_file(video, COMPLAINTS_DIR)
-                video_paths.append(video_path)
-        
-        document_paths = []
-        for doc in documents:
-            if doc:
-                doc_path = save_file(doc, COMPLAINTS_DIR)
-                document_paths.append(doc_path)
-        
-        id_proof_path = ""
-        if id_proof_document:
-            id_proof_path = save_file(id_proof_document, COMPLAINTS_DIR)
-        
-        selfie_path = ""
-        if selfie:
-            selfie_path = save_file(selfie, COMPLAINTS_DIR)
+        # Save uploaded files, all at once
+        saved = await uploads.save_all({
+            "photos": photos,
+            "videos": videos,
+            "documents": documents,
+            "id_proof": id_proof_document,
+            "selfie": selfie
+        })
+        saved["videos"] += [uploads.reference(upload_sessions.path_of(upload_id)) for upload_id in split_ids(video_upload_ids)]
         
         # Create complaint object
         complaint = {
@@ -463,13 +507,7 @@ async def register_complaint(
                 "id_proof_type": id_proof_type,
                 "id_proof_number": id_proof_number
             },
-            "files": {
-                "photos": photo_paths,
-                "videos": video_paths,
-                "documents": document_paths,
-                "id_proof": id_proof_path,
-                "selfie": selfie_path
-            },
+            "files": saved,
             "status": "New",
             "priority": "Medium",
             "submitted_at": datetime.now().isoformat(),
@@ -488,9 +526,35 @@ async def register_complaint(
             "resolved_at": None
         }
         
-        complaints_db.append(complaint)
+        # A complaint about an issue already reported joins that complaint's cluster
+        # instead of becoming a separate work item
+        primary = find_duplicate_cluster(complaint)
+        if primary is not None:
+            complaint["status"] = "Duplicate"
+            complaint["duplicate_of"] = primary["id"]
+            complaint["updates"].append({
+                "date": datetime.now().isoformat(),
+                "status": "Duplicate",
+                "message": f"Linked to complaint {primary['id']}, which reports the same issue",
+                "officer": "System"
+            })
+        
+        await complaints_db.add(complaint)
+        uploads.keep()
+        if primary is not None:
+            # A copy, so the stored primary is unchanged until the update announces it. Read
+            # again after the await above and updated without another in between, so
+            # concurrent registrations linking to the same primary do not drop each other's ids
+            primary = complaints_db.get(primary["id"]) or primary
+            duplicate_ids = primary.get("duplicate_ids", []) + [complaint_id]
+            primary = {**primary, "duplicate_ids": duplicate_ids, "duplicate_count": len(duplicate_ids)}
+            await complaints_db.update(primary)
         update_admin_data()
-        save_data()  # Save data after each complaint registration
+        
+        # Thumbnails and previews are generated after the response is sent
+        images = [path for path in saved["photos"] + [saved["id_proof"], saved["selfie"]] if path and is_image(path)]
+        if images:
+            media_pipeline.schedule(process_complaint_media(complaint_id, images))
         
         print(f"Complaint registered successfully: {complaint_id}")
         print(f"Total complaints in database: {len(complaints_db)}")
@@ -499,25 +563,33 @@ async def register_complaint(
             "success": True,
             "message": "Complaint registered successfully",
             "complaint_id": complaint_id,
+            "duplicate_of": complaint.get("duplicate_of"),
             "complaint": complaint
         }
     
+    except HTTPException:
+        uploads.discard()
+        raise
     except Exception as e:
+        uploads.discard()
         print(f"Error registering complaint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to register complaint: {str(e)}")
 
+def find_duplicate_cluster(complaint: dict) -> Optional[dict]:
+    """Open complaint heading the cluster a new complaint duplicates, if any"""
+    for _, _, cluster_id in duplicate_index.find(complaint):
+        primary = complaints_db.get(cluster_id)
+        if primary is not None and str(primary.get("status") or "").lower() not in CLOSED_STATUSES:
+            return primary
+    return None
+
 @app.get("/api/complaints/track/{complaint_id}")
 async def track_complaint(complaint_id: str):
     """Track complaint status by ID"""
     print(f"Tracking complaint with ID: {complaint_id}")
-    print(f"Available complaints: {[c['id'] for c in complaints_db]}")
-    
-    # Try exact match first
-    complaint = next((c for c in complaints_db if c["id"] == complaint_id), None)
     
-    # If not found, try case-insensitive match
-    if not complaint:
-        complaint = next((c for c in complaints_db if c["id"].lower() == complaint_id.lower()), None)
+    # Exact match first, then case-insensitive match
+    complaint = complaints_db.lookup(complaint_id)
     
     if not complaint:
         print(f"Complaint not found for ID: {complaint_id}")
@@ -531,23 +603,39 @@ async def track_complaint(complaint_id: str):
     }
 
 @app.get("/api/complaints/user/{user_id}")
-async def get_user_complaints(user_id: str):
+async def get_user_complaints(request: Request, user_id: str):
     """Get all complaints for a specific user (by contact number)"""
-    user_complaints = [c for c in complaints_db if c["complainant"]["contact_number"] == user_id]
+    def build():
+        user_complaints = complaints_db.find(contact_number=user_id)
+        return {
+            "success": True,
+            "complaints": user_complaints,
+            "total": len(user_complaints)
+        }
     
-    return {
-        "success": True,
-        "complaints": user_complaints,
-        "total": len(user_complaints)
-    }
+    return response_cache.respond(request, (complaints_db.version,), build)
 
 @app.get("/api/complaints/all")
-async def get_all_complaints():
+async def get_all_complaints(request: Request, query: CollectionQuery = Depends()):
     """Get all complaints (for admin dashboard)"""
+    return list_collection(request, complaints_db, "complaints", query)
+
+@app.get("/api/complaints/{complaint_id}/cluster")
+async def get_complaint_cluster(complaint_id: str):
+    """A complaint's duplicate cluster: the first complaint about the issue and those linked to it"""
+    complaint = complaints_db.lookup(complaint_id)
+    if not complaint:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    primary = complaints_db.get(complaint["duplicate_of"]) if complaint.get("duplicate_of") else complaint
+    if primary is None:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    duplicates = [record for record in (complaints_db.get(record_id) for record_id in primary.get("duplicate_ids", [])) if record]
     return {
         "success": True,
-        "complaints": complaints_db,
-        "total": len(complaints_db)
+        "cluster_id": primary["id"],
+        "primary": primary,
+        "duplicates": duplicates,
+        "size": 1 + len(duplicates)
     }
 
 @app.put("/api/complaints/{complaint_id}/status")
@@ -563,12 +651,8 @@ async def update_complaint_status(
     """Update complaint status (for admin use)"""
     print(f"Updating complaint status for ID: {complaint_id}")
     
-    # Try exact match first
-    complaint = next((c for c in complaints_db if c["id"] == complaint_id), None)
-    
-    # If not found, try case-insensitive match
-    if not complaint:
-        complaint = next((c for c in complaints_db if c["id"].lower() == complaint_id.lower()), None)
+    # Exact match first, then case-insensitive match
+    complaint = complaints_db.lookup(complaint_id)
     
     if not complaint:
         print(f"Complaint not found for ID: {complaint_id}")
@@ -598,8 +682,20 @@ async def update_complaint_status(
     if status == "Resolved":
         complaint["resolved_at"] = datetime.now().isoformat()
     
+    await complaints_db.update(complaint)
+    
+    # Closing a cluster's primary complaint closes the duplicates linked to it
+    if status.lower() in CLOSED_STATUSES:
+        for duplicate_id in complaint.get("duplicate_ids", []):
+            duplicate = complaints_db.get(duplicate_id)
+            if duplicate is None or duplicate["status"] != "Duplicate":
+                continue
+            duplicate["status"] = status
+            duplicate["updates"].append({**update_entry, "message": f"{message} (via linked complaint {complaint['id']})"})
+            if status == "Resolved":
+                duplicate["resolved_at"] = complaint["resolved_at"]
+            await complaints_db.update(duplicate)
     update_admin_data()
-    save_data() # Save data after each complaint status update
     
     return {
         "success": True,
@@ -629,11 +725,11 @@ async def submit_property_verification(
     electricity_bill: Optional[UploadFile] = File(None)
 ):
     """Submit property documents for verification"""
+    uploads = new_upload_batch()
     try:
         ticket_number = generate_id("PVT")
         
-        # Save uploaded files
-        files = {}
+        # Save uploaded files, all at once
         file_fields = {
             "sale_deed": sale_deed,
             "property_tax_receipt": property_tax_receipt,
@@ -649,10 +745,8 @@ async def submit_property_verification(
             "electricity_bill": electricity_bill
         }
         
-        for field_name, file in file_fields.items():
-            if file:
-                file_path = save_file(file, PROPERTY_DIR)
-                files[field_name] = file_path
+        saved = await uploads.save_all(file_fields)
+        files = {field_name: path for field_name, path in saved.items() if path}
         
         # Create verification request
         verification = {
@@ -674,9 +768,9 @@ async def submit_property_verification(
             "verification_notes": None
         }
         
-        property_verifications_db.append(verification)
+        await property_verifications_db.add(verification)
+        uploads.keep()
         update_admin_data()
-        save_data() # Save data after each property verification submission
         
         return {
             "success": True,
@@ -685,17 +779,17 @@ async def submit_property_verification(
             "verification": verification
         }
     
+    except HTTPException:
+        uploads.discard()
+        raise
     except Exception as e:
+        uploads.discard()
         raise HTTPException(status_code=500, detail=f"Failed to submit verification: {str(e)}")
 
 @app.get("/api/property/verifications/all")
-async def get_all_property_verifications():
+async def get_all_property_verifications(request: Request, query: CollectionQuery = Depends()):
     """Get all property verifications (for admin dashboard)"""
-    return {
-        "success": True,
-        "verifications": property_verifications_db,
-        "total": len(property_verifications_db)
-    }
+    return list_collection(request, property_verifications_db, "verifications", query)
 
 @app.put("/api/property/verifications/{ticket_id}/verify")
 async def verify_property_documents(
@@ -705,7 +799,7 @@ async def verify_property_documents(
     verified_by: str = Form(...)
 ):
     """Verify property documents (for admin use)"""
-    verification = next((v for v in property_verifications_db if v["id"] == ticket_id), None)
+    verification = property_verifications_db.get(ticket_id)
     
     if not verification:
         raise HTTPException(status_code=404, detail="Verification request not found")
@@ -716,8 +810,8 @@ async def verify_property_documents(
     if notes:
         verification["verification_notes"] = notes
     
+    await property_verifications_db.update(verification)
     update_admin_data()
-    save_data() # Save data after each property verification update
     
     return {
         "success": True,
@@ -748,11 +842,11 @@ async def submit_building_approval(
     electricity_bill: Optional[UploadFile] = File(None)
 ):
     """Submit building approval application"""
+    uploads = new_upload_batch()
     try:
         ticket_number = generate_id("BAP")
         
-        # Save uploaded files
-        files = {}
+        # Save uploaded files, all at once
         file_fields = {
             "sale_deed": sale_deed,
             "layout_plan": layout_plan,
@@ -765,10 +859,8 @@ async def submit_building_approval(
             "electricity_bill": electricity_bill
         }
         
-        for field_name, file in file_fields.items():
-            if file:
-                file_path = save_file(file, BUILDING_DIR)
-                files[field_name] = file_path
+        saved = await uploads.save_all(file_fields)
+        files = {field_name: path for field_name, path in saved.items() if path}
         
         # Create building approval request
         approval = {
@@ -795,9 +887,9 @@ async def submit_building_approval(
             "rejection_reason": None
         }
         
-        building_approvals_db.append(approval)
+        await building_approvals_db.add(approval)
+        uploads.keep()
         update_admin_data()
-        save_data() # Save data after each building approval submission
         
         return {
             "success": True,
@@ -806,17 +898,17 @@ async def submit_building_approval(
             "approval": approval
         }
     
+    except HTTPException:
+        uploads.discard()
+        raise
     except Exception as e:
+        uploads.discard()
         raise HTTPException(status_code=500, detail=f"Failed to submit building approval: {str(e)}")
 
 @app.get("/api/building/approvals/all")
-async def get_all_building_approvals():
+async def get_all_building_approvals(request: Request, query: CollectionQuery = Depends()):
     """Get all building approvals (for admin dashboard)"""
-    return {
-        "success": True,
-        "approvals": building_approvals_db,
-        "total": len(building_approvals_db)
-    }
+    return list_collection(request, building_approvals_db, "approvals", query)
 
 @app.put("/api/building/approvals/{ticket_id}/approve")
 async def approve_building_application(
@@ -827,7 +919,7 @@ async def approve_building_application(
     rejection_reason: Optional[str] = Form(None)
 ):
     """Approve or reject building application (for admin use)"""
-    approval = next((a for a in building_approvals_db if a["id"] == ticket_id), None)
+    approval = building_approvals_db.get(ticket_id)
     
     if not approval:
         raise HTTPException(status_code=404, detail="Building approval request not found")
@@ -844,8 +936,8 @@ async def approve_building_application(
     else:
         raise HTTPException(status_code=400, detail="Invalid action. Use 'approve' or 'reject'")
     
+    await building_approvals_db.update(approval)
     update_admin_data()
-    save_data() # Save data after each building approval update
     
     return {
         "success": True,
@@ -854,9 +946,62 @@ async def approve_building_application(
     }
 
 # Admin dashboard endpoint
+# Collections the dashboard can load section by section
+DASHBOARD_SECTIONS = {
+    "surveys": surveys_db,
+    "illegal_constructions": illegal_constructions_db,
+    "complaints": complaints_db,
+    "property_verifications": property_verifications_db,
+    "building_approvals": building_approvals_db,
+}
+# Bulky fields left out of section items unless asked for with ?fields=
+# (surveys created before regulation versions embed a full regulations_used copy)
+SECTION_HEAVY_FIELDS = {
+    "surveys": ("drone_data_used", "regulations_used"),
+}
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated ?fields= value"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+def project_record(record: dict, fields: Optional[List[str]]) -> dict:
+    """Keep only the requested fields of a record; dotted names select nested fields"""
+    if fields is None:
+        return record
+    projected = {}
+    for field in fields:
+        value = record
+        parts = field.split(".")
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = projected
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return projected
+
+async def stream_dashboard(data: dict, fields: Optional[List[str]]):
+    """Encode the full dashboard response, streaming each section's records"""
+    yield b'{"success": true, "data": '
+    sections = {section: iter(repository) for section, repository in DASHBOARD_SECTIONS.items()}
+    async for chunk in stream_json_object(data, sections, transform=lambda record: project_record(record, fields)):
+        yield chunk
+    yield b"}"
+
 @app.get("/api/admin/dashboard")
-async def get_admin_dashboard():
-    """Get admin dashboard data with analytics"""
+async def get_admin_dashboard(request: Request, summary: bool = False, fields: Optional[str] = None, stream: bool = False):
+    """Get admin dashboard data with analytics.
+    
+    With ?summary=true only counts and analytics are returned and the record
+    lists are loaded through /api/admin/dashboard/{section}. ?fields=id,status
+    limits every returned record to the listed fields. ?stream=true sends the
+    full response as it is encoded.
+    """
     try:
         # Calculate analytics
         total_surveys = len(surveys_db)
@@ -865,334 +1010,461 @@ async def get_admin_dashboard():
         total_property_verifications = len(property_verifications_db)
         total_building_approvals = len(building_approvals_db)
         
-        # Survey analytics
-        if total_surveys > 0:
-            high_severity_violations = len([v for v in illegal_constructions_db if v.get("severity") == "high"])
-            medium_severity_violations = len([v for v in illegal_constructions_db if v.get("severity") == "medium"])
-            low_severity_violations = len([v for v in illegal_constructions_db if v.get("severity") == "low"])
-            
-            # Ward-wise violation distribution
-            ward_violations = {}
-            for violation in illegal_constructions_db:
-                ward = violation.get("ward_no", "Unknown")
-                ward_violations[ward] = ward_violations.get(ward, 0) + 1
-            
-            # Recent activity (last 7 days)
-            from datetime import datetime, timedelta
-            week_ago = datetime.now() - timedelta(days=7)
-            recent_surveys = [s for s in surveys_db if datetime.fromisoformat(s["created_at"]) > week_ago]
-            recent_violations = [v for v in illegal_constructions_db if datetime.fromisoformat(v["detected_at"]) > week_ago]
-            
-            survey_analytics = {
+        # Survey analytics are maintained incrementally by dashboard_analytics
+        survey_analytics = dashboard_analytics.survey_analytics(total_surveys, total_violations)
+        
+        data = {
+            "overview": {
+                "total_complaints": total_complaints,
+                "total_property_verifications": total_property_verifications,
+                "total_building_approvals": total_building_approvals,
                 "total_surveys": total_surveys,
-                "total_violations": total_violations,
-                "severity_breakdown": {
-                    "high": high_severity_violations,
-                    "medium": medium_severity_violations,
-                    "low": low_severity_violations
-                },
-                "ward_distribution": ward_violations,
-                "recent_activity": {
-                    "surveys_last_week": len(recent_surveys),
-                    "violations_last_week": len(recent_violations)
-                },
-                "compliance_rate": round(((total_surveys - total_violations) / total_surveys) * 100, 2) if total_surveys > 0 else 0
-            }
-        else:
-            survey_analytics = {
-                "total_surveys": 0,
-                "total_violations": 0,
-                "severity_breakdown": {"high": 0, "medium": 0, "low": 0},
-                "ward_distribution": {},
-                "recent_activity": {"surveys_last_week": 0, "violations_last_week": 0},
-                "compliance_rate": 0
+                "total_violations": total_violations
+            },
+            "analytics": survey_analytics
+        }
+        
+        if stream and not summary:
+            return StreamingResponse(stream_dashboard(data, parse_fields(fields)), media_type="application/json")
+        
+        def build():
+            if summary:
+                data["status_breakdown"] = {
+                    section: repository.count_by("status")
+                    for section, repository in DASHBOARD_SECTIONS.items()
+                }
+            else:
+                field_list = parse_fields(fields)
+                for section, repository in DASHBOARD_SECTIONS.items():
+                    data[section] = [project_record(record, field_list) for record in repository.all()]
+            return {
+                "success": True,
+                "data": data
             }
         
+        # The recent-activity window moves with time, so the analytics are part of the ETag
+        versions = tuple(repository.version for repository in DASHBOARD_SECTIONS.values())
+        return response_cache.respond(request, versions, build, extra=survey_analytics)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch admin dashboard data: {str(e)}")
+
+@app.get("/api/admin/dashboard/{section}")
+async def get_admin_dashboard_section(
+    request: Request,
+    section: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = None
+):
+    """Get one page of a dashboard section (surveys, complaints, ...)"""
+    repository = DASHBOARD_SECTIONS.get(section)
+    if repository is None:
+        raise HTTPException(status_code=404, detail=f"Unknown dashboard section: {section}")
+    
+    def build():
+        field_list = parse_fields(fields)
+        heavy_fields = SECTION_HEAVY_FIELDS.get(section, ())
+        items = []
+        for record in repository.page(offset, limit):
+            if field_list is None and heavy_fields:
+                record = {key: value for key, value in record.items() if key not in heavy_fields}
+            items.append(project_record(record, field_list))
+        
+        total = len(repository)
         return {
             "success": True,
-            "data": {
-                "overview": {
-                    "total_complaints": total_complaints,
-                    "total_property_verifications": total_property_verifications,
-                    "total_building_approvals": total_building_approvals,
-                    "total_surveys": total_surveys,
-                    "total_violations": total_violations
-                },
-                "surveys": surveys_db,
-                "illegal_constructions": illegal_constructions_db,
-                "complaints": complaints_db,
-                "property_verifications": property_verifications_db,
-                "building_approvals": building_approvals_db,
-                "analytics": survey_analytics
-            }
+            "section": section,
+            "items": items,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if offset + limit < total else None
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch admin dashboard data: {str(e)}")
+    
+    return response_cache.respond(request, (repository.version,), build)
 
-# Survey endpoints
-@app.post("/api/surveys/start")
-async def start_survey(
-    survey_data: str = Form(...),  # JSON string of survey data
-    drone_data_file: Optional[UploadFile] = File(None)
+# Filters and groupings each time series metric supports
+TIMESERIES_DIMENSIONS = {
+    "complaints": ("ward", "category", "status"),
+    "violations": ("ward", "severity"),
+    "resolution_time": ("ward", "category"),
+}
+# Periods returned when the window is not given, and the most one request may cover
+TIMESERIES_DEFAULT_PERIODS = {"day": 30, "week": 12, "month": 12}
+TIMESERIES_MAX_PERIODS = 1000
+
+@app.get("/api/analytics/timeseries")
+async def get_timeseries(
+    request: Request,
+    metric: str = Query("complaints", description="complaints, violations or resolution_time"),
+    granularity: str = Query("day", description="day, week or month"),
+    date_from: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Last date of the window (YYYY-MM-DD), default today"),
+    ward: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    severity: Optional[str] = None,
+    group_by: Optional[str] = Query(None, description="Dimension to break each period down by")
 ):
-    """Start a new survey with drone data analysis"""
+    """Complaint counts, violation counts or median resolution time per day, week or month"""
+    dimensions = TIMESERIES_DIMENSIONS.get(metric)
+    if dimensions is None:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown granularity: {granularity}")
+    filters = {name: value for name, value in (("ward", ward), ("category", category), ("status", status), ("severity", severity)) if value is not None}
+    unsupported = sorted(name for name in filters if name not in dimensions)
+    if group_by is not None and group_by not in dimensions:
+        unsupported.append(group_by)
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"{metric} cannot be filtered or grouped by: {', '.join(unsupported)}")
     try:
-        # Parse survey data
-        print(f"Raw survey_data received: {survey_data}")
-        survey_json = json.loads(survey_data)
-        print(f"Parsed survey_json: {survey_json}")
-        print(f"Survey data type: {type(survey_json)}")
-        
-        # Validate required fields
-        required_fields = ["ward_no", "survey_date", "drone_id", "coordinates"]
-        for field in required_fields:
-            if not survey_json.get(field):
-                raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
-        
-        # Initialize data for detection - default to form data
-        data_for_detection = survey_json
-        drone_file_path = ""
-        
-        # If drone data file is provided, use it for detection
-        if drone_data_file:
-            # Read the drone data file content
-            await drone_data_file.seek(0)  # Reset file pointer
-            file_content_bytes = await drone_data_file.read()
-            
-            # Reset file pointer again for saving
-            await drone_data_file.seek(0)
-            drone_file_path = save_file(drone_data_file, UPLOAD_DIR / "surveys")
-            
-            try:
-                # Parse the drone data file as JSON
-                parsed_drone_data = json.loads(file_content_bytes.decode('utf-8'))
+        last = date.fromisoformat(date_to) if date_to else date.today()
+        first = date.fromisoformat(date_from) if date_from else periods_back(last, granularity, TIMESERIES_DEFAULT_PERIODS[granularity])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date_from and date_to must be dates (YYYY-MM-DD)")
+    if first > last:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    if period_count(first, last, granularity) > TIMESERIES_MAX_PERIODS:
+        raise HTTPException(status_code=400, detail=f"At most {TIMESERIES_MAX_PERIODS} periods per request")
+    
+    def build():
+        return {
+            "success": True,
+            "metric": metric,
+            "granularity": granularity,
+            "date_from": first.isoformat(),
+            "date_to": last.isoformat(),
+            "group_by": group_by,
+            **trend_rollups.series(metric, granularity, first, last, filters, group_by)
+        }
+    
+    # The window goes into the ETag: without date_to it moves with the date
+    return response_cache.respond(request, (complaints_db.version, illegal_constructions_db.version), build,
+                                  extra=[first.isoformat(), last.isoformat()])
+
+# Regulation endpoints
+@app.get("/api/regulations")
+async def list_regulations():
+    """Available regulation versions and the one new surveys use"""
+    return {
+        "success": True,
+        "active_version": regulation_registry.active,
+        "versions": [rule_set.summary() for rule_set in regulation_registry.versions()]
+    }
+
+@app.get("/api/regulations/{version}")
+async def get_regulations(version: str):
+    """Full regulations of one version, e.g. the one a survey references"""
+    rule_set = regulation_registry.get(version)
+    if rule_set is None:
+        raise HTTPException(status_code=404, detail="Regulation version not found")
+    return {"success": True, "version": version, "regulations": rule_set.document}
+
+# Survey endpoints
+def build_survey_record(survey_json: dict, data: dict, violations: List[dict], drone_file_path: str, regulation_version: str,
+                        ward_index: Optional[int] = None) -> dict:
+    """Survey record with analytics for one ward's detection results.
+
+    A ward of a multi-ward file is not copied into the record: ``ward_index``
+    is its position in the array stored at ``drone_file_path``.
+    """
+    # Calculate comprehensive analytics
+    total_buildings = len(data.get("buildings", []))
+    total_roads = len(data.get("roads", []))
+    
+    # Convert string values to float for area calculations with error handling
+    land_usage = data.get("land_usage", {})
+    try:
+        total_area = sum([
+            float(land_usage.get("residential_area_sq_meters", 0) or 0),
+            float(land_usage.get("commercial_area_sq_meters", 0) or 0),
+            float(land_usage.get("industrial_area_sq_meters", 0) or 0)
+        ])
+    except (ValueError, TypeError):
+        total_area = 0
+    
+    # Create survey record with enhanced data
+    survey = {
+        "id": generate_id("SUR"),
+        "survey_data": survey_json,
+        "drone_file_path": drone_file_path,
+        "violations": violations,
+        "regulation_version": regulation_version,
+        "status": "completed",
+        "created_at": datetime.now().isoformat(),
+        "ward_no": data.get("ward_no", survey_json.get("ward_no")),
+        "survey_date": data.get("survey_date", survey_json.get("survey_date")),
+        "drone_id": data.get("drone_id", survey_json.get("drone_id")),
+        "coordinates": data.get("coordinates", survey_json.get("coordinates")),
+        "total_violations": len(violations),
+        "total_buildings": total_buildings,
+        "total_roads": total_roads,
+        "total_area_sq_meters": total_area,
+        "severity_summary": {
+            "high": len([v for v in violations if v.get("severity") == "high"]),
+            "medium": len([v for v in violations if v.get("severity") == "medium"]),
+            "low": len([v for v in violations if v.get("severity") == "low"])
+        },
+        "compliance_score": round(((total_buildings + total_roads - len(violations)) / (total_buildings + total_roads)) * 100, 2) if (total_buildings + total_roads) > 0 else 100,
+        "ward_name": f"Ward {data.get('ward_no', survey_json.get('ward_no'))}",
+        "incharge_id": survey_json.get("incharge_id", "Unknown"),
+        "survey_type": "Field Survey with Drone Data" if drone_file_path else "Manual Field Survey"
+    }
+    if ward_index is None:
+        survey["drone_data_used"] = data  # Store the actual data used for detection
+    else:
+        survey["drone_ward_index"] = ward_index
+    return survey
+
+def build_violation_records(survey: dict, survey_json: dict, data: dict, violations: List[dict]) -> List[dict]:
+    """Detailed illegal construction records of a survey for admin"""
+    records = []
+    for violation in violations:
+        records.append({
+            "id": generate_id("ILL"),
+            "survey_id": survey["id"],
+            "building_id": violation.get("building_id"),
+            "road_id": violation.get("road_id"),
+            "violation_type": violation.get("type"),
+            "current_value": violation.get("current"),
+            "allowed_value": violation.get("allowed"),
+            "severity": violation.get("severity"),
+            "ward_no": data.get("ward_no", survey_json.get("ward_no")),
+            "ward_name": f"Ward {data.get('ward_no', survey_json.get('ward_no'))}",
+            "coordinates": data.get("coordinates", survey_json.get("coordinates")),
+            "detected_at": datetime.now().isoformat(),
+            "status": "detected",
+            "action_required": True,
+            "priority": "high" if violation.get("severity") == "high" else "medium" if violation.get("severity") == "medium" else "low",
+            "estimated_resolution_days": 30 if violation.get("severity") == "high" else 60 if violation.get("severity") == "medium" else 90
+        })
+    return records
+
+def parse_survey_form(survey_data: str) -> dict:
+    """Survey details sent as a JSON form field, checked for the required fields"""
+    survey_json = json.loads(survey_data)
+    
+    # Validate required fields
+    required_fields = ["ward_no", "survey_date", "drone_id", "coordinates"]
+    for field in required_fields:
+        if not survey_json.get(field):
+            raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
+    return survey_json
+
+async def save_drone_data(uploads: UploadBatch, drone_data_file: Optional[UploadFile], drone_upload_id: Optional[str]) -> str:
+    """Stored path of the drone data: a file in this request or a completed resumable upload"""
+    if drone_upload_id:
+        return uploads.reference(upload_sessions.path_of(drone_upload_id))
+    if drone_data_file:
+        return await uploads.save(drone_data_file)
+    return ""
+
+async def run_survey(survey_json: dict, uploads: UploadBatch, drone_file_path: str, progress: Optional[dict] = None) -> dict:
+    """Detect violations, store the survey records and return the summary.
+
+    Every survey record storing ``drone_file_path`` holds a reference to it,
+    taken through ``uploads``. ``progress`` is updated with the current stage
+    and the wards analyzed so far.
+    """
+    progress = {} if progress is None else progress
+    
+    def on_progress(count: int):
+        progress["wards_analyzed"] = count
+    
+    # Initialize data for detection - default to form data
+    data_for_detection = survey_json
+    
+    # Compiled rules of the active regulation version
+    rules = regulation_registry.current()
+    if rules is None:
+        raise HTTPException(status_code=503, detail=f"Regulation version {regulation_registry.active} is not available")
+    
+    # Survey and violation records of every ward in this submission, built as
+    # each ward is checked so the parsed ward need not be kept
+    surveys = []
+    new_violations = []
+    
+    def add_ward(ward_index: Optional[int], ward_data: dict, violations: List[dict]):
+        survey = build_survey_record(survey_json, ward_data, violations, drone_file_path, rules.version, ward_index)
+        surveys.append(survey)
+        new_violations.extend(build_violation_records(survey, survey_json, ward_data, violations))
+    
+    progress["stage"] = "analyzing"
+    
+    # If drone data is provided, use it for detection
+    if drone_file_path:
+        try:
+            if await asyncio.to_thread(is_json_array, drone_file_path):
+                # Multi-ward export: one survey per ward, checked in the worker processes
+                await detection_pool.analyze(drone_wards(drone_file_path, survey_json), rules, DETECTION_ENGINE, add_ward, on_progress)
+                if not surveys:
+                    print(f"Warning: Drone data file '{drone_file_path}' contains no wards. Using form data for detection.")
+            else:
+                # Parse the stored drone data file as JSON, off the event loop
+                parsed_drone_data = await asyncio.to_thread(read_json_file, drone_file_path)
                 
                 # Use drone data for detection instead of form data
-                data_for_detection = parsed_drone_data
+                data_for_detection = merge_survey_metadata(parsed_drone_data, survey_json)
                 
-                # Merge essential metadata from form if not present in drone data
-                if "ward_no" not in data_for_detection:
-                    data_for_detection["ward_no"] = survey_json.get("ward_no")
-                if "survey_date" not in data_for_detection:
-                    data_for_detection["survey_date"] = survey_json.get("survey_date")
-                if "drone_id" not in data_for_detection:
-                    data_for_detection["drone_id"] = survey_json.get("drone_id")
-                if "coordinates" not in data_for_detection:
-                    data_for_detection["coordinates"] = survey_json.get("coordinates")
-                    
-            except json.JSONDecodeError:
-                print(f"Warning: Drone data file '{drone_data_file.filename}' is not a valid JSON. Using form data for detection.")
-                data_for_detection = survey_json
-            except Exception as e:
-                print(f"Error processing drone data file: {e}. Using form data for detection.")
-                data_for_detection = survey_json
-        
-        # Enhanced building regulations with more zones
-        regulations = {
-            "city": "Indore",
-            "year": 2025,
-            "zones": {
-                "residential": {
-                    "zone_code": "RES",
-                    "building_regulations": {
-                        "building_height_limit_meters": 18,
-                        "max_floors": 5,
-                        "floor_area_ratio": 1.5,
-                        "setbacks": {
-                            "front_setback_meters": 3,
-                            "rear_setback_meters": 2,
-                            "side_setback_meters": 1.5
-                        },
-                        "land_use": "Residential",
-                        "road_width_minimum_meters": 9,
-                        "parking_requirement": {
-                            "car": "1 per 75 sq.m builtup area",
-                            "two_wheeler": "1 per 40 sq.m builtup area"
-                        }
-                    },
-                    "special_restrictions": {
-                        "basement_usage": "Only for parking, not for commercial",
-                        "rooftop_construction": "Allowed only for utilities (water tank, solar panel)",
-                        "green_area_minimum_percent": 10
-                    }
-                },
-                "commercial": {
-                    "zone_code": "COM",
-                    "building_regulations": {
-                        "building_height_limit_meters": 30,
-                        "max_floors": 8,
-                        "floor_area_ratio": 2.5,
-                        "setbacks": {
-                            "front_setback_meters": 5,
-                            "rear_setback_meters": 3,
-                            "side_setback_meters": 2
-                        },
-                        "land_use": "Commercial",
-                        "road_width_minimum_meters": 12,
-                        "parking_requirement": {
-                            "car": "1 per 50 sq.m builtup area",
-                            "two_wheeler": "1 per 30 sq.m builtup area"
-                        }
-                    },
-                    "special_restrictions": {
-                        "basement_usage": "Allowed for parking + storage (not retail)",
-                        "rooftop_construction": "Allowed for utilities and solar panel only",
-                        "green_area_minimum_percent": 5
-                    }
-                },
-                "industrial": {
-                    "zone_code": "IND",
-                    "building_regulations": {
-                        "building_height_limit_meters": 25,
-                        "max_floors": 6,
-                        "floor_area_ratio": 2.0,
-                        "setbacks": {
-                            "front_setback_meters": 8,
-                            "rear_setback_meters": 5,
-                            "side_setback_meters": 4
-                        },
-                        "land_use": "Industrial",
-                        "road_width_minimum_meters": 15,
-                        "parking_requirement": {
-                            "car": "1 per 100 sq.m builtup area",
-                            "two_wheeler": "1 per 50 sq.m builtup area"
-                        }
-                    },
-                    "special_restrictions": {
-                        "basement_usage": "Allowed for storage and utilities",
-                        "rooftop_construction": "Allowed for utilities and solar panel",
-                        "green_area_minimum_percent": 8
-                    }
-                },
-                "mixed": {
-                    "zone_code": "MIX",
-                    "building_regulations": {
-                        "building_height_limit_meters": 24,
-                        "max_floors": 7,
-                        "floor_area_ratio": 2.2,
-                        "setbacks": {
-                            "front_setback_meters": 4,
-                            "rear_setback_meters": 3,
-                            "side_setback_meters": 2.5
-                        },
-                        "land_use": "Mixed Use",
-                        "road_width_minimum_meters": 10,
-                        "parking_requirement": {
-                            "car": "1 per 60 sq.m builtup area",
-                            "two_wheeler": "1 per 35 sq.m builtup area"
-                        }
-                    },
-                    "special_restrictions": {
-                        "basement_usage": "Allowed for parking and storage",
-                        "rooftop_construction": "Allowed for utilities and solar panel",
-                        "green_area_minimum_percent": 7
-                    }
-                }
-            }
-        }
-        
-        # Enhanced illegal construction detection using the appropriate data source
-        print(f"Data for detection before calling detect_illegal_constructions: {data_for_detection}")
-        print(f"Data type: {type(data_for_detection)}")
-        try:
-            violations = detect_illegal_constructions(data_for_detection, regulations)
+        except DetectionError:
+            # A failed check is not a parse problem: fail the survey rather than fall back
+            raise
+        except ValueError:  # Malformed JSON (at any point of a multi-ward file) or text encoding
+            print(f"Warning: Drone data file '{drone_file_path}' is not a valid JSON. Using form data for detection.")
+            data_for_detection = survey_json
+            # Wards checked before the error are not stored
+            surveys.clear()
+            new_violations.clear()
         except Exception as e:
-            print(f"Error in detect_illegal_constructions: {e}")
-            print(f"Data for detection: {data_for_detection}")
-            violations = []
-        
-        # Calculate comprehensive analytics
-        total_buildings = len(data_for_detection.get("buildings", []))
-        total_roads = len(data_for_detection.get("roads", []))
-        
-        # Convert string values to float for area calculations with error handling
-        land_usage = data_for_detection.get("land_usage", {})
-        try:
-            total_area = sum([
-                float(land_usage.get("residential_area_sq_meters", 0) or 0),
-                float(land_usage.get("commercial_area_sq_meters", 0) or 0),
-                float(land_usage.get("industrial_area_sq_meters", 0) or 0)
-            ])
-        except (ValueError, TypeError):
-            total_area = 0
-        
-        # Create survey record with enhanced data
-        survey_id = generate_id("SUR")
-        survey = {
-            "id": survey_id,
-            "survey_data": survey_json,
-            "drone_file_path": drone_file_path,
-            "drone_data_used": data_for_detection,  # Store the actual data used for detection
-            "violations": violations,
-            "regulations_used": regulations,
-            "status": "completed",
-            "created_at": datetime.now().isoformat(),
-            "ward_no": data_for_detection.get("ward_no", survey_json.get("ward_no")),
-            "survey_date": data_for_detection.get("survey_date", survey_json.get("survey_date")),
-            "drone_id": data_for_detection.get("drone_id", survey_json.get("drone_id")),
-            "coordinates": data_for_detection.get("coordinates", survey_json.get("coordinates")),
-            "total_violations": len(violations),
-            "total_buildings": total_buildings,
-            "total_roads": total_roads,
-            "total_area_sq_meters": total_area,
-            "severity_summary": {
-                "high": len([v for v in violations if v.get("severity") == "high"]),
-                "medium": len([v for v in violations if v.get("severity") == "medium"]),
-                "low": len([v for v in violations if v.get("severity") == "low"])
-            },
-            "compliance_score": round(((total_buildings + total_roads - len(violations)) / (total_buildings + total_roads)) * 100, 2) if (total_buildings + total_roads) > 0 else 100,
-            "ward_name": f"Ward {data_for_detection.get('ward_no', survey_json.get('ward_no'))}",
-            "incharge_id": survey_json.get("incharge_id", "Unknown"),
-            "survey_type": "Field Survey with Drone Data" if drone_data_file else "Manual Field Survey"
-        }
-        
-        surveys_db.append(survey)
-        
-        # Create detailed illegal construction records for admin
-        for violation in violations:
-            illegal_construction = {
-                "id": generate_id("ILL"),
-                "survey_id": survey_id,
-                "building_id": violation.get("building_id"),
-                "road_id": violation.get("road_id"),
-                "violation_type": violation.get("type"),
-                "current_value": violation.get("current"),
-                "allowed_value": violation.get("allowed"),
-                "severity": violation.get("severity"),
-                "ward_no": data_for_detection.get("ward_no", survey_json.get("ward_no")),
-                "ward_name": f"Ward {data_for_detection.get('ward_no', survey_json.get('ward_no'))}",
-                "coordinates": data_for_detection.get("coordinates", survey_json.get("coordinates")),
-                "detected_at": datetime.now().isoformat(),
-                "status": "detected",
-                "action_required": True,
-                "priority": "high" if violation.get("severity") == "high" else "medium" if violation.get("severity") == "medium" else "low",
-                "estimated_resolution_days": 30 if violation.get("severity") == "high" else 60 if violation.get("severity") == "medium" else 90
-            }
-            illegal_constructions_db.append(illegal_construction)
-        
-        update_admin_data()
-        save_data() # Save data after each survey completion
-        
+            print(f"Error processing drone data file: {e}. Using form data for detection.")
+            data_for_detection = survey_json
+            surveys.clear()
+            new_violations.clear()
+    
+    if not surveys:
+        # Enhanced illegal construction detection using the appropriate data source, off the event loop
+        validate_and_clean_survey_data(data_for_detection)
+        await detection_pool.analyze(iter([(None, data_for_detection)]), rules, DETECTION_ENGINE, add_ward, on_progress)
+    
+    # Surveys from one multi-ward file share a batch id
+    batch_id = generate_id("BAT") if len(surveys) > 1 else None
+    if batch_id:
+        for survey in surveys:
+            survey["batch_id"] = batch_id
+    
+    # save_drone_data took the first survey's reference to the drone file
+    if drone_file_path:
+        for _ in surveys[1:]:
+            uploads.reference(drone_file_path)
+    
+    # One write for all surveys and one for all their violations
+    progress["stage"] = "saving"
+    await surveys_db.add(*surveys)
+    uploads.keep()
+    await illegal_constructions_db.add(*new_violations)
+    update_admin_data()
+    
+    survey = surveys[0]
+    if batch_id is None:
         return {
             "success": True,
             "message": "Survey completed successfully with comprehensive analysis",
-            "survey_id": survey_id,
+            "survey_id": survey["id"],
             "survey": survey,
-            "violations_detected": len(violations),
+            "violations_detected": survey["total_violations"],
             "severity_breakdown": survey["severity_summary"],
             "compliance_score": survey["compliance_score"],
-            "total_buildings_analyzed": total_buildings,
-            "total_roads_analyzed": total_roads,
-            "total_area_covered": total_area
+            "total_buildings_analyzed": survey["total_buildings"],
+            "total_roads_analyzed": survey["total_roads"],
+            "total_area_covered": survey["total_area_sq_meters"]
         }
     
+    # Multi-ward file: totals over all wards; survey_id/survey are the first ward's
+    total_structures = sum(item["total_buildings"] + item["total_roads"] for item in surveys)
+    return {
+        "success": True,
+        "message": f"Survey completed successfully for {len(surveys)} wards",
+        "batch_id": batch_id,
+        "survey_id": survey["id"],
+        "survey": survey,
+        "survey_ids": [item["id"] for item in surveys],
+        "wards": [
+            {
+                "survey_id": item["id"],
+                "ward_no": item["ward_no"],
+                "violations_detected": item["total_violations"],
+                "compliance_score": item["compliance_score"]
+            }
+            for item in surveys
+        ],
+        "violations_detected": len(new_violations),
+        "severity_breakdown": {
+            severity: sum(item["severity_summary"][severity] for item in surveys)
+            for severity in ("high", "medium", "low")
+        },
+        "compliance_score": round(((total_structures - len(new_violations)) / total_structures) * 100, 2) if total_structures > 0 else 100,
+        "total_buildings_analyzed": sum(item["total_buildings"] for item in surveys),
+        "total_roads_analyzed": sum(item["total_roads"] for item in surveys),
+        "total_area_covered": sum(item["total_area_sq_meters"] for item in surveys)
+    }
+
+@app.post("/api/surveys/start")
+async def start_survey(
+    survey_data: str = Form(...),  # JSON string of survey data
+    drone_data_file: Optional[UploadFile] = File(None),
+    drone_upload_id: Optional[str] = Form(None)  # Id of a completed resumable upload, instead of drone_data_file
+):
+    """Start a new survey with drone data analysis"""
+    uploads = new_upload_batch()
+    try:
+        survey_json = parse_survey_form(survey_data)
+        drone_file_path = await save_drone_data(uploads, drone_data_file, drone_upload_id)
+        return await run_survey(survey_json, uploads, drone_file_path)
+    
+    except HTTPException:
+        uploads.discard()
+        raise
     except Exception as e:
+        uploads.discard()
         raise HTTPException(status_code=500, detail=f"Failed to process survey: {str(e)}")
 
+@app.post("/api/surveys/jobs", status_code=202)
+async def submit_survey_job(
+    survey_data: str = Form(...),  # JSON string of survey data
+    drone_data_file: Optional[UploadFile] = File(None),
+    drone_upload_id: Optional[str] = Form(None)  # Id of a completed resumable upload, instead of drone_data_file
+):
+    """Accept a survey for background analysis; poll the returned job for the result"""
+    uploads = new_upload_batch()
+    try:
+        survey_json = parse_survey_form(survey_data)
+        drone_file_path = await save_drone_data(uploads, drone_data_file, drone_upload_id)
+        
+        async def run(job: dict) -> dict:
+            try:
+                result = await run_survey(survey_json, uploads, drone_file_path, job["progress"])
+            except Exception:
+                uploads.discard()
+                raise
+            # The full record is at /api/surveys/{survey_id}
+            result.pop("survey", None)
+            return result
+        
+        job = survey_jobs.submit(generate_id("JOB"), "survey", run, cancel=uploads.discard)
+    
+    except HTTPException:
+        uploads.discard()
+        raise
+    except Exception as e:
+        uploads.discard()
+        raise HTTPException(status_code=500, detail=f"Failed to submit survey: {str(e)}")
+    
+    status_url = f"/api/surveys/jobs/{job['id']}"
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "job_id": job["id"], "status": job["status"], "status_url": status_url},
+        headers={"Location": status_url}
+    )
+
+@app.get("/api/surveys/jobs/{job_id}")
+async def get_survey_job(job_id: str):
+    """Progress of a survey job, and its result once completed"""
+    job = survey_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "job": survey_jobs.describe(job)}
+
+@app.get("/api/surveys/all")
+async def get_all_surveys(request: Request, query: CollectionQuery = Depends()):
+    """Get all surveys (for admin dashboard)"""
+    return list_collection(request, surveys_db, "surveys", query)
+
+# Registered after /api/surveys/all so that path is not taken as a survey id
 @app.get("/api/surveys/{survey_id}")
 async def get_survey(survey_id: str):
     """Get survey details by ID"""
-    survey = next((s for s in surveys_db if s["id"] == survey_id), None)
+    survey = surveys_db.get(survey_id)
     
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
@@ -1202,23 +1474,10 @@ async def get_survey(survey_id: str):
         "survey": survey
     }
 
-@app.get("/api/surveys/all")
-async def get_all_surveys():
-    """Get all surveys (for admin dashboard)"""
-    return {
-        "success": True,
-        "surveys": surveys_db,
-        "total": len(surveys_db)
-    }
-
 @app.get("/api/illegal-constructions/all")
-async def get_all_illegal_constructions():
+async def get_all_illegal_constructions(request: Request, query: CollectionQuery = Depends()):
     """Get all illegal constructions (for admin dashboard)"""
-    return {
-        "success": True,
-        "illegal_constructions": illegal_constructions_db,
-        "total": len(illegal_constructions_db)
-    }
+    return list_collection(request, illegal_constructions_db, "illegal_constructions", query)
 
 @app.put("/api/illegal-constructions/{violation_id}/status")
 async def update_violation_status(
@@ -1229,7 +1488,7 @@ async def update_violation_status(
     notes: Optional[str] = Form(None)
 ):
     """Update illegal construction violation status"""
-    violation = next((v for v in illegal_constructions_db if v["id"] == violation_id), None)
+    violation = illegal_constructions_db.get(violation_id)
     
     if not violation:
         raise HTTPException(status_code=404, detail="Violation not found")
@@ -1240,8 +1499,8 @@ async def update_violation_status(
     violation["notes"] = notes
     violation["updated_at"] = datetime.now().isoformat()
     
+    await illegal_constructions_db.update(violation)
     update_admin_data()
-    save_data() # Save data after each violation status update
     
     return {
         "success": True,
@@ -1261,7 +1520,7 @@ async def update_illegal_construction_status(
     """Update illegal construction violation status"""
     try:
         # Find the violation
-        violation = next((v for v in illegal_constructions_db if v["id"] == violation_id), None)
+        violation = illegal_constructions_db.get(violation_id)
         
         if not violation:
             raise HTTPException(status_code=404, detail="Violation not found")
@@ -1289,8 +1548,8 @@ async def update_illegal_construction_status(
         if status == "resolved":
             violation["resolved_at"] = datetime.now().isoformat()
         
+        await illegal_constructions_db.update(violation)
         update_admin_data()
-        save_data()
         
         return {
             "success": True,
@@ -1302,39 +1561,231 @@ async def update_illegal_construction_status(
         raise HTTPException(status_code=500, detail=f"Failed to update violation status: {str(e)}")
 
 # File download endpoint
-@app.get("/uploads/{file_path:path}")
-async def download_file(file_path: str):
-    """Download uploaded files"""
-    file_location = UPLOAD_DIR / file_path
-    
-    if not file_location.exists():
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    return FileResponse(file_location)
+@app.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"])
+async def download_file(request: Request, file_path: str):
+    """Download uploaded files, with byte ranges, validators and long-lived caching"""
+    # Files of unfinished resumable uploads are never served
+    return await serve_upload(request, UPLOAD_DIR, file_path, upload_store,
+                              private=[upload_sessions.directory, upload_store.tmp_dir])
 
 # User endpoints for property verifications and building approvals
 @app.get("/api/property/user/{user_contact}")
-async def get_user_property_verifications(user_contact: str):
+async def get_user_property_verifications(request: Request, user_contact: str):
     """Get all property verifications for a specific user (by contact number)"""
-    user_verifications = [v for v in property_verifications_db if v.get("contact_number") == user_contact]
+    def build():
+        user_verifications = property_verifications_db.find(contact_number=user_contact)
+        return {
+            "success": True,
+            "verifications": user_verifications,
+            "total": len(user_verifications)
+        }
     
-    return {
-        "success": True,
-        "verifications": user_verifications,
-        "total": len(user_verifications)
-    }
+    return response_cache.respond(request, (property_verifications_db.version,), build)
 
 @app.get("/api/building/user/{user_contact}")
-async def get_user_building_approvals(user_contact: str):
+async def get_user_building_approvals(request: Request, user_contact: str):
     """Get all building approvals for a specific user (by contact number)"""
-    user_approvals = [a for a in building_approvals_db if a.get("contact_number") == user_contact]
+    def build():
+        user_approvals = building_approvals_db.find(contact_number=user_contact)
+        return {
+            "success": True,
+            "approvals": user_approvals,
+            "total": len(user_approvals)
+        }
     
+    return response_cache.respond(request, (building_approvals_db.version,), build)
+
+# Resumable uploads
+@app.post("/api/uploads")
+async def create_upload_session(
+    filename: str = Form(...),
+    size: int = Form(...),  # Total size of the file in bytes
+    sha256: Optional[str] = Form(None)  # Optional checksum verified when the upload is completed
+):
+    """Open a resumable upload session"""
+    return {"success": True, "upload": upload_sessions.create(filename, size, sha256)}
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """Progress of an upload; after an interruption, resume from ``offset``"""
+    return {"success": True, "upload": upload_sessions.status(upload_id)}
+
+@app.put("/api/uploads/{upload_id}")
+async def upload_chunk(request: Request, upload_id: str, offset: int = Query(..., ge=0)):
+    """Append the raw request body as the chunk starting at ``offset``"""
+    upload = await upload_sessions.append(upload_id, offset, request.stream())
+    return {"success": True, "upload": upload}
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    """Verify a fully received upload; its id can then be used in submissions"""
+    return {"success": True, "upload": await upload_sessions.complete(upload_id)}
+
+# Live change feed
+@app.get("/api/events/stream")
+async def stream_events(
+    request: Request,
+    collections: Optional[str] = Query(None, description="Comma-separated collections to follow, default all"),
+    ward: Optional[str] = Query(None, description="Only events for this ward")
+):
+    """Push insert and update events to dashboards as server-sent events"""
+    wanted = [name.strip() for name in collections.split(",") if name.strip()] if collections else None
+    unknown = sorted(set(wanted or ()) - set(COLLECTIONS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collections: {', '.join(unknown)}")
+
+    subscription = change_feed.subscribe(wanted, ward)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while not subscription.closed:
+                event = await subscription.next(EVENT_KEEPALIVE_SECONDS)
+                if await request.is_disconnected():
+                    break
+                if event is None:
+                    if subscription.closed:
+                        break
+                    yield ": keep-alive\n\n"
+                else:
+                    yield format_sse(event)
+        finally:
+            change_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Delta sync
+@app.get("/api/sync/changes")
+async def get_changes(
+    since: int = Query(0, ge=0, description="Sequence number returned by the previous sync"),
+    epoch: Optional[str] = Query(None, description="Epoch returned by the previous sync"),
+    collections: Optional[str] = Query(None, description="Comma-separated collections to sync, default all"),
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """Records created or changed after sequence ``since``, latest version only"""
+    wanted = {name.strip() for name in collections.split(",") if name.strip()} if collections else None
+    unknown = sorted((wanted or set()) - set(COLLECTIONS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collections: {', '.join(unknown)}")
+
+    if change_log.needs_resync(since, epoch):
+        return {
+            "success": True,
+            "epoch": change_log.epoch,
+            "sequence": change_log.sequence,
+            "horizon": change_log.horizon,
+            "full_resync_required": True,
+            "changes": {}
+        }
+
+    entries, position = change_log.since(since, wanted, limit)
+    changes = {}
+    for seq, collection, record_id in entries:
+        record = COLLECTIONS[collection].get(record_id)
+        if record is not None:
+            changes.setdefault(collection, []).append({**record, "_seq": seq})
+
+    return {
+        "success": True,
+        "epoch": change_log.epoch,
+        "sequence": position,
+        "horizon": change_log.horizon,
+        "full_resync_required": False,
+        "has_more": position < change_log.sequence,
+        "changes": changes
+    }
+
+# Location queries for map views
+def geo_collections(collections: Optional[str]) -> Optional[set]:
+    """Collections named in a ?collections= value, default all located ones"""
+    wanted = {name.strip() for name in collections.split(",") if name.strip()} if collections else None
+    unknown = sorted((wanted or set()) - set(SPATIAL_COLLECTIONS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown or unlocated collections: {', '.join(unknown)}")
+    return wanted
+
+def geo_response(matches: List[tuple], limit: int, fields: Optional[str]) -> dict:
+    """Records of (collection, id, extra fields) matches, grouped by collection"""
+    field_list = parse_fields(fields)
+    results = {}
+    for collection, record_id, extra in matches[:limit]:
+        record = COLLECTIONS[collection].get(record_id)
+        if record is not None:
+            results.setdefault(collection, []).append({**project_record(record, field_list), **extra})
     return {
         "success": True,
-        "approvals": user_approvals,
-        "total": len(user_approvals)
+        "count": sum(len(records) for records in results.values()),
+        "total": len(matches),
+        "truncated": len(matches) > limit,
+        "results": results
     }
 
+@app.get("/api/search")
+async def search_records(
+    q: str = Query(..., min_length=1, max_length=200),
+    collections: Optional[str] = Query(None, description="Comma-separated collections, default complaints, property_verifications and building_approvals"),
+    status: Optional[str] = None,
+    ward: Optional[str] = None,
+    category: Optional[str] = None,
+    prefix: bool = Query(True, description="Let the last word match longer terms"),
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return per record")
+):
+    """Records matching the words of ``q``, best first"""
+    wanted = {name.strip() for name in collections.split(",") if name.strip()} if collections else None
+    unknown = sorted((wanted or set()) - set(SEARCH_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown or unsearchable collections: {', '.join(unknown)}")
+    found, total = search_index.search(q, wanted, {"status": status, "ward": ward, "category": category}, limit, prefix)
+    field_list = parse_fields(fields)
+    results = []
+    for score, collection, record_id in found:
+        record = COLLECTIONS[collection].get(record_id)
+        if record is not None:
+            results.append({**project_record(record, field_list), "_collection": collection, "_score": round(score, 4)})
+    return {
+        "success": True,
+        "query": q,
+        "count": len(results),
+        "total": total,
+        "results": results
+    }
+
+@app.get("/api/geo/radius")
+async def records_within_radius(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(..., gt=0, le=20_000_000),
+    collections: Optional[str] = Query(None, description="Comma-separated collections, default complaints, surveys and illegal_constructions"),
+    limit: int = Query(500, ge=1, le=5000),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return per record")
+):
+    """Located records within ``radius_m`` meters of a point, nearest first"""
+    found = geo_index.within_radius(lat, lon, radius_m, geo_collections(collections))
+    matches = [(collection, record_id, {"_distance_m": round(distance, 1)}) for distance, collection, record_id in found]
+    return geo_response(matches, limit, fields)
+
+@app.get("/api/geo/bbox")
+async def records_within_bbox(
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    collections: Optional[str] = Query(None, description="Comma-separated collections, default complaints, surveys and illegal_constructions"),
+    limit: int = Query(500, ge=1, le=5000),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return per record")
+):
+    """Located records inside a bounding box; west > east crosses the antimeridian"""
+    if south > north:
+        raise HTTPException(status_code=400, detail="south must not be greater than north")
+    found = geo_index.within_box(south, west, north, east, geo_collections(collections))
+    matches = [(collection, record_id, {}) for collection, record_id, _, _ in found]
+    return geo_response(matches, limit, fields)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -1407,9 +1858,8 @@ async def add_test_complaint():
             "resolved_at": None
         }
         
-        complaints_db.append(test_complaint)
+        await complaints_db.add(test_complaint)
         update_admin_data()
-        save_data()
         
         print(f"Test complaint added: {complaint_id}")
         
@@ -0,0 +1,126 @@
+import asyncio
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from PIL import Image, ImageOps
+
+# Uploaded files that get derivatives
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+# Longest side in pixels of each derivative
+THUMBNAIL_SIZE = 256
+PREVIEW_SIZE = 1024
+OPTIMIZED_SIZE = 2048
+# The optimized copy is re-encoded at falling quality until it fits this many bytes
+OPTIMIZED_MAX_BYTES = 1024 * 1024
+OPTIMIZED_QUALITIES = (85, 78, 70, 62, 55, 48)
+
+
+def is_image(path: str) -> bool:
+    return Path(path).suffix.lower() in IMAGE_SUFFIXES
+
+
+def derivative_paths(source: str, output_root: Path) -> Dict[str, Path]:
+    """Where the derivatives of ``source`` live; named after the source, so a
+    content-addressed upload shares its derivatives with every duplicate"""
+    stem = Path(source).stem
+    directory = output_root / stem[:2] / stem[2:4]
+    return {
+        "thumbnail": directory / f"{stem}_thumb.jpg",
+        "preview": directory / f"{stem}_preview.jpg",
+        "optimized": directory / f"{stem}_web.jpg",
+    }
+
+
+def encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    # No exif argument: the metadata of the original (GPS position included) is dropped
+    image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.part")
+    with open(temp_path, "wb") as buffer:
+        buffer.write(data)
+    os.replace(temp_path, path)
+
+
+def make_derivatives(source: str, output_root: Path) -> Dict[str, str]:
+    """Decode an image once and write its optimized, preview and thumbnail JPEGs.
+
+    Runs in a worker thread. Each derivative is scaled down from the previous,
+    larger one, and the image is rotated upright from its EXIF orientation
+    before the metadata is stripped.
+    """
+    paths = derivative_paths(source, output_root)
+    if all(path.exists() for path in paths.values()):
+        return {name: str(path) for name, path in paths.items()}
+
+    with Image.open(source) as original:
+        # Let the JPEG decoder downscale while decoding when the source is much larger
+        original.draft("RGB", (OPTIMIZED_SIZE, OPTIMIZED_SIZE))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGB")
+
+    image.thumbnail((OPTIMIZED_SIZE, OPTIMIZED_SIZE), Image.LANCZOS)
+    for quality in OPTIMIZED_QUALITIES:
+        data = encode_jpeg(image, quality)
+        if len(data) <= OPTIMIZED_MAX_BYTES:
+            break
+    write_atomic(paths["optimized"], data)
+
+    image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.LANCZOS)
+    write_atomic(paths["preview"], encode_jpeg(image, 82))
+
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+    write_atomic(paths["thumbnail"], encode_jpeg(image, 80))
+
+    return {name: str(path) for name, path in paths.items()}
+
+
+class MediaPipeline:
+    """Background image processing off the request path.
+
+    Derivatives are produced by a small thread pool (Pillow releases the GIL
+    while decoding, resizing and encoding); the asyncio tasks waiting on them
+    are tracked so shutdown can let them finish.
+    """
+
+    def __init__(self, output_root: Path, workers: int = 2):
+        self.output_root = output_root
+        self.workers = workers
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.tasks: Set[asyncio.Task] = set()
+
+    def start(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media")
+
+    async def derive(self, source: str) -> Optional[Dict[str, str]]:
+        """Derivative paths for one uploaded image, or None if it could not be processed"""
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, make_derivatives, source, self.output_root)
+        except Exception as e:
+            print(f"Error processing image {source}: {e}")
+            return None
+
+    def schedule(self, coroutine) -> asyncio.Task:
+        """Run a processing job in the background, keeping a reference until it is done"""
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def stop(self):
+        """Wait for scheduled jobs, then shut the workers down"""
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -0,0 +1,149 @@
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Only the columnar detection engine needs the limit table
+    np = None
+
+# Zone used for buildings whose type has no entry of its own
+DEFAULT_ZONE = "residential"
+
+
+class ZoneRules(NamedTuple):
+    """Limits of one zone, pulled out of its nested regulation entry.
+
+    Values keep their JSON type so violation descriptions read "18m", not "18.0m".
+    """
+    height_limit: float
+    max_floors: int
+    far_limit: float
+    front_setback: float
+
+
+def limit_value(value, name: str):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    return value
+
+def compile_zone(name: str, zone: dict) -> ZoneRules:
+    try:
+        building = zone["building_regulations"]
+        values = (
+            building["building_height_limit_meters"],
+            building["max_floors"],
+            building["floor_area_ratio"],
+            building["setbacks"]["front_setback_meters"],
+        )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Zone '{name}' is missing {e}")
+    return ZoneRules(*(limit_value(value, f"{name}.{field}") for value, field in zip(values, ZoneRules._fields)))
+
+
+class RuleSet:
+    """One regulation version, compiled once when its file is loaded.
+
+    ``zones`` maps each zone type to its flat limits; ``table`` holds the same
+    limits as a (zones x 4) float64 array for the columnar detection engine,
+    with rows in ``rows`` order.
+    """
+
+    def __init__(self, version: str, document: dict):
+        if not isinstance(document.get("zones"), dict):
+            raise ValueError("'zones' must be an object")
+        self.version = version
+        self.document = document
+        self.zones: Dict[str, ZoneRules] = {name: compile_zone(name, zone) for name, zone in document["zones"].items()}
+        if DEFAULT_ZONE not in self.zones:
+            raise ValueError(f"Zone '{DEFAULT_ZONE}' is required")
+        self.default = self.zones[DEFAULT_ZONE]
+        self.rows = {name: row for row, name in enumerate(self.zones)}
+        self.table = np.array(list(self.zones.values()), dtype=np.float64) if np is not None else None
+
+    def zone(self, name: str) -> ZoneRules:
+        return self.zones.get(name, self.default)
+
+    def limits(self, names: List[str]) -> Tuple[List[ZoneRules], "np.ndarray"]:
+        """Rules and a (len(names) x 4) limit table for the given zone types"""
+        default_row = self.rows[DEFAULT_ZONE]
+        rows = [self.rows.get(name, default_row) for name in names]
+        return [self.zone(name) for name in names], self.table[rows]
+
+    def summary(self) -> dict:
+        return {
+            "version": self.version,
+            "city": self.document.get("city"),
+            "year": self.document.get("year"),
+            "zones": list(self.zones),
+        }
+
+
+class RegulationRegistry:
+    """Regulation versions loaded from the ``*.json`` files of a directory.
+
+    A file's version id is its "version" field, or the file name without
+    ``.json``. Files are stat'ed at most every ``check_interval`` seconds, and
+    a changed, added or removed file is picked up without a restart. A file
+    that fails to compile is reported and the version keeps its last good rules.
+    """
+
+    def __init__(self, directory: Path, active: str, check_interval: float = 2.0):
+        self.directory = directory
+        self.active = active
+        self.check_interval = check_interval
+        self.rule_sets: Dict[str, RuleSet] = {}
+        self.files: Dict[Path, Tuple[Tuple[int, int], Optional[str]]] = {}
+        self.checked_at: Optional[float] = None
+
+    def load(self):
+        self.checked_at = time.monotonic()
+        present = {}
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            present[path] = (stat.st_mtime_ns, stat.st_size)
+
+        for path in [path for path in self.files if path not in present]:
+            _, version = self.files.pop(path)
+            if version is not None:
+                self.rule_sets.pop(version, None)
+                print(f"Regulation set {version} removed ({path.name})")
+
+        for path, signature in present.items():
+            known = self.files.get(path)
+            if known is not None and known[0] == signature:
+                continue
+            version = known[1] if known is not None else None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    document = json.load(f)
+                rule_set = RuleSet(str(document.get("version") or path.stem), document)
+                if version is not None and version != rule_set.version:
+                    self.rule_sets.pop(version, None)
+                version = rule_set.version
+                self.rule_sets[version] = rule_set
+                print(f"Loaded regulation set {version} ({path.name})")
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"Error loading regulation set {path.name}: {e}")
+            self.files[path] = (signature, version)
+
+    def refresh(self):
+        """Reload changed files once the check interval has passed"""
+        if self.checked_at is None or time.monotonic() - self.checked_at >= self.check_interval:
+            self.load()
+
+    def get(self, version: str) -> Optional[RuleSet]:
+        self.refresh()
+        return self.rule_sets.get(version)
+
+    def current(self) -> Optional[RuleSet]:
+        """The rule set new surveys are checked against"""
+        return self.get(self.active)
+
+    def versions(self) -> List[RuleSet]:
+        self.refresh()
+        return [self.rule_sets[version] for version in sorted(self.rule_sets)]
@@ -0,0 +1,182 @@
+import bisect
+import heapq
+import math
+import unicodedata
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from storage import Repository
+
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms a prefix expands to at most, and the shortest prefix that is expanded
+MAX_PREFIX_TERMS = 50
+MIN_PREFIX_LENGTH = 3
+# Columns results can be filtered on
+SEARCH_FILTERS = ("status", "ward", "category")
+
+# Words too common to help ranking, in both languages
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "of", "on", "or", "the", "this", "to", "was", "with",
+    "और", "का", "की", "के", "को", "तथा", "था", "थी", "थे", "ने", "पर", "में", "से", "है", "हैं", "हो",
+}
+# Devanagari spelling variants folded together: nukta dropped (ज़ -> ज),
+# chandrabindu written as anusvara (हँ -> हं)
+DEVANAGARI_FOLDING = str.maketrans({"़": None, "ँ": "ं"})
+
+
+def tokenize(text: str) -> List[str]:
+    """Search terms of a text: lowercase runs of letters and digits, with the
+    combining marks of Devanagari words kept, Devanagari variants folded and
+    stopwords dropped. Hindi and English may be mixed freely."""
+    text = unicodedata.normalize("NFC", text).lower().translate(DEVANAGARI_FOLDING)
+    characters = [
+        character if character.isalnum() or unicodedata.category(character)[0] == "M" else " "
+        for character in text
+    ]
+    return [token for token in "".join(characters).split() if token not in STOPWORDS]
+
+
+class SearchIndex:
+    """Inverted index over the text fields of several collections, kept up to date as a repository listener.
+
+    ``fields`` maps each collection to its indexed fields and their weights; a
+    term in a field of weight 2 counts as two occurrences. Documents are
+    ranked with BM25 over all collections together. The vocabulary is kept
+    sorted, so the last word of a query also matches the terms it is a prefix
+    of ("pot" finds "pothole"). A query reads only the postings of its terms,
+    so its cost follows how common those terms are, not the collection sizes.
+    """
+
+    def __init__(self, repositories: Dict[str, "Repository"], fields: Dict[str, Dict[str, float]]):
+        self.repositories = repositories
+        self.fields = fields
+        self.reset()
+
+    def reset(self):
+        # term -> {(collection, id): (weighted frequency, document length)}; the
+        # length is repeated so scoring need not look up every document
+        self.postings: Dict[str, Dict[Tuple[str, str], Tuple[float, float]]] = {}
+        self.vocabulary: List[str] = []
+        self.documents: Dict[Tuple[str, str], dict] = {}
+        self.total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def terms(self, collection: str, record: dict) -> Counter:
+        counts = Counter()
+        for field, weight in self.fields[collection].items():
+            value = record.get(field)
+            if value:
+                for token in tokenize(str(value)):
+                    counts[token] += weight
+        return counts
+
+    def add(self, collection: str, record: dict):
+        """Index a record, replacing what was indexed for it before"""
+        key = (collection, record["id"])
+        repository = self.repositories[collection]
+        filters = {column: repository.field(record, column) for column in SEARCH_FILTERS}
+        text = tuple(record.get(field) for field in self.fields[collection])
+        document = self.documents.get(key)
+        if document is not None:
+            if document["text"] == text:
+                document["filters"] = filters
+                return
+            self.remove(key)
+
+        counts = self.terms(collection, record)
+        length = sum(counts.values())
+        for term, frequency in counts.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                bisect.insort(self.vocabulary, term)
+            postings[key] = (frequency, length)
+        self.documents[key] = {"terms": list(counts), "length": length, "text": text, "filters": filters}
+        self.total_length += length
+
+    def remove(self, key: Tuple[str, str]):
+        document = self.documents.pop(key, None)
+        if document is None:
+            return
+        self.total_length -= document["length"]
+        for term in document["terms"]:
+            postings = self.postings[term]
+            del postings[key]
+            if not postings:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+
+    def rebuild(self):
+        """Index every record of the configured collections from scratch"""
+        self.reset()
+        for collection in self.fields:
+            for record in self.repositories[collection]:
+                self.add(collection, record)
+
+    def on_change(self, collection: str, op: str, record: dict, previous: Optional[dict]):
+        """Repository listener"""
+        if collection in self.fields:
+            self.add(collection, record)
+
+    def expand(self, prefix: str) -> List[str]:
+        """Indexed terms starting with ``prefix``, the shortest first"""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\uffff", start)
+        terms = self.vocabulary[start:end]
+        if len(terms) > MAX_PREFIX_TERMS:
+            terms = heapq.nsmallest(MAX_PREFIX_TERMS, terms, key=len)
+        return terms
+
+    @staticmethod
+    def accepts(key: Tuple[str, str], document: dict, collections: Optional[Set[str]], filters: Dict[str, str]) -> bool:
+        if collections is not None and key[0] not in collections:
+            return False
+        return all(document["filters"][column] == value for column, value in filters.items())
+
+    def search(self, query: str, collections: Optional[Set[str]] = None, filters: Optional[Dict[str, str]] = None,
+               limit: int = 20, prefix: bool = True) -> Tuple[List[Tuple[float, str, str]], int]:
+        """``(score, collection, id)`` of the best ``limit`` matches, best first, and the number of matches.
+
+        Each query word scores a document with BM25. With ``prefix``, the
+        last word also matches longer terms, scoring the best of them.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words or not self.documents:
+            return [], 0
+        filters = {column: value for column, value in (filters or {}).items() if value is not None}
+        count = len(self.documents)
+        documents = self.documents
+        restricted = collections is not None or bool(filters)
+        # BM25 length normalization k1 * (1 - b + b * length / average) as base + scale * length
+        base = BM25_K1 * (1 - BM25_B)
+        scale = BM25_K1 * BM25_B / (self.total_length / count or 1.0)
+
+        scores: Dict[Tuple[str, str], float] = {}
+        for position, word in enumerate(words):
+            terms = [word]
+            if prefix and position == len(words) - 1 and len(word) >= MIN_PREFIX_LENGTH:
+                terms = self.expand(word) or terms
+            best: Dict[Tuple[str, str], float] = {}
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                weight = idf * (BM25_K1 + 1)
+                for key, (frequency, length) in postings.items():
+                    if restricted and not self.accepts(key, documents[key], collections, filters):
+                        continue
+                    score = weight * frequency / (frequency + base + scale * length)
+                    if score > best.get(key, 0.0):
+                        best[key] = score
+            for key, score in best.items():
+                scores[key] = scores.get(key, 0.0) + score
+
+        top = heapq.nlargest(limit, ((score, key) for key, score in scores.items()))
+        return [(score, collection, record_id) for score, (collection, record_id) in top], len(scores)
@@ -0,0 +1,155 @@
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Mean earth radius used for distances
+EARTH_RADIUS_METERS = 6371008.8
+
+
+def parse_coordinate(value, limit: float) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number) or abs(number) > limit:
+        return None
+    return number
+
+
+def record_location(record: dict) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) of a record, or None if it has no usable location.
+
+    Complaints carry top-level ``latitude``/``longitude``; surveys and illegal
+    constructions a ``coordinates`` object, or a "lat,lon" string from the
+    survey form. Values may be numbers or numeric strings.
+    """
+    if record.get("latitude") not in (None, "") or record.get("longitude") not in (None, ""):
+        latitude, longitude = record.get("latitude"), record.get("longitude")
+    else:
+        coordinates = record.get("coordinates")
+        if isinstance(coordinates, dict):
+            latitude, longitude = coordinates.get("latitude"), coordinates.get("longitude")
+        elif isinstance(coordinates, str) and coordinates.count(",") == 1:
+            latitude, longitude = coordinates.split(",")
+        else:
+            return None
+    latitude = parse_coordinate(latitude, 90)
+    longitude = parse_coordinate(longitude, 180)
+    if latitude is None or longitude is None:
+        return None
+    return latitude, longitude
+
+
+def distance_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_dphi = math.radians(lat2 - lat1) / 2
+    half_dlambda = math.radians(lon2 - lon1) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoGrid:
+    """In-memory grid index of record locations, kept up to date as a repository listener.
+
+    The world is cut into square cells of ``cell_degrees``; each cell holds the
+    records located in it. A box query visits only the cells the box overlaps,
+    so its cost follows the size of the box and of the result, not of the
+    collections.
+    """
+
+    def __init__(self, cell_degrees: float = 0.01):
+        self.cell_degrees = cell_degrees
+        self.reset()
+
+    def reset(self):
+        self.cells: Dict[Tuple[int, int], Dict[Tuple[str, str], Tuple[float, float]]] = {}
+        self.positions: Dict[Tuple[str, str], Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees)
+
+    def place(self, collection: str, record_id: str, location: Optional[Tuple[float, float]]):
+        """Move a record to ``location``, or drop it from the index when None"""
+        key = (collection, record_id)
+        current = self.positions.pop(key, None)
+        if current is not None:
+            members = self.cells[current]
+            del members[key]
+            if not members:
+                del self.cells[current]
+        if location is not None:
+            cell = self.cell(*location)
+            self.cells.setdefault(cell, {})[key] = location
+            self.positions[key] = cell
+
+    def rebuild(self, repositories: Dict[str, Iterable[dict]]):
+        """Index every record of the given collections from scratch"""
+        self.reset()
+        for collection, records in repositories.items():
+            for record in records:
+                self.place(collection, record["id"], record_location(record))
+
+    def on_change(self, collection: str, op: str, record: dict, previous: Optional[dict]):
+        """Repository listener"""
+        self.place(collection, record["id"], record_location(record))
+
+    def within_box(self, south: float, west: float, north: float, east: float,
+                   collections: Optional[Set[str]] = None) -> List[Tuple[str, str, float, float]]:
+        """``(collection, id, latitude, longitude)`` of records inside the box.
+
+        A box with ``west`` greater than ``east`` crosses the antimeridian.
+        """
+        if west > east:
+            return (self.within_box(south, west, north, 180.0, collections)
+                    + self.within_box(south, -180.0, north, east, collections))
+
+        low_row, low_column = self.cell(south, west)
+        high_row, high_column = self.cell(north, east)
+        matches = []
+        if (high_row - low_row + 1) * (high_column - low_column + 1) > len(self.cells):
+            # Box larger than the populated area: walking the occupied cells is cheaper
+            candidates = [
+                members for (row, column), members in self.cells.items()
+                if low_row <= row <= high_row and low_column <= column <= high_column
+            ]
+        else:
+            candidates = [
+                self.cells[(row, column)]
+                for row in range(low_row, high_row + 1)
+                for column in range(low_column, high_column + 1)
+                if (row, column) in self.cells
+            ]
+        for members in candidates:
+            for (collection, record_id), (latitude, longitude) in members.items():
+                if collections is not None and collection not in collections:
+                    continue
+                if south <= latitude <= north and west <= longitude <= east:
+                    matches.append((collection, record_id, latitude, longitude))
+        return matches
+
+    def within_radius(self, latitude: float, longitude: float, radius_meters: float,
+                      collections: Optional[Set[str]] = None) -> List[Tuple[float, str, str]]:
+        """``(distance, collection, id)`` of records within ``radius_meters``, nearest first"""
+        # Bounding box of the circle: its angular radius in latitude, and the
+        # widest longitude span of a spherical cap in longitude
+        angle = radius_meters / EARTH_RADIUS_METERS
+        latitude_delta = math.degrees(angle)
+        south, north = latitude - latitude_delta, latitude + latitude_delta
+        if south <= -90 or north >= 90 or math.sin(angle) >= math.cos(math.radians(latitude)):
+            south, north = max(-90.0, south), min(90.0, north)
+            west, east = -180.0, 180.0
+        else:
+            longitude_delta = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+            west = (longitude - longitude_delta + 180) % 360 - 180
+            east = (longitude + longitude_delta + 180) % 360 - 180
+
+        found = []
+        for collection, record_id, point_latitude, point_longitude in self.within_box(south, west, north, east, collections):
+            distance = distance_meters(latitude, longitude, point_latitude, point_longitude)
+            if distance <= radius_meters:
+                found.append((distance, collection, record_id))
+        found.sort()
+        return found
@@ -0,0 +1,853 @@
+import asyncio
+import base64
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import weakref
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class CollectionJournal:
+    """Snapshot file plus an append-only journal of record writes for one collection.
+
+    Every mutation appends one compact ``{"op": "put", "record": ...}`` line to
+    ``<collection>.journal`` and fsyncs it, so the cost of a write depends on the
+    size of the changed record rather than the size of the collection. On load
+    the snapshot is read and the journal is replayed on top of it; ``compact()``
+    folds the journal back into the snapshot.
+    """
+
+    def __init__(self, snapshot_path: Path):
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = self.snapshot_path.with_suffix(".journal")
+        self.entries = 0
+
+    def load(self) -> List[dict]:
+        """Read the snapshot and replay the journal on top of it"""
+        records = []
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+
+        positions = {record["id"]: i for i, record in enumerate(records)}
+        self.entries = 0
+
+        if self.journal_path.exists():
+            # Byte offset just past the last complete entry
+            complete = 0
+            with open(self.journal_path, 'r+b') as f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("missing newline")
+                        entry = json.loads(line) if line.strip() else None
+                    except ValueError:
+                        # A torn final line means the process died mid-append;
+                        # everything before it was fsync'd and is kept. The tail
+                        # is cut off so the next append starts on a fresh line.
+                        print(f"Warning: dropping incomplete journal entry at {self.journal_path}:{line_number}")
+                        f.truncate(complete)
+                        f.flush()
+                        os.fsync(f.fileno())
+                        break
+                    complete += len(line)
+                    if entry is None:
+                        continue
+
+                    if entry.get("op") == "put":
+                        record = entry["record"]
+                        position = positions.get(record["id"])
+                        if position is None:
+                            positions[record["id"]] = len(records)
+                            records.append(record)
+                        else:
+                            records[position] = record
+                    self.entries += 1
+
+        return records
+
+    @staticmethod
+    def encode(records: Iterable[dict]) -> str:
+        """Encode records as journal lines"""
+        return "".join(
+            json.dumps({"op": "put", "record": record}, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for record in records
+        )
+
+    def append(self, records: Iterable[dict]):
+        """Append one journal entry per record and fsync the journal"""
+        self.append_encoded(self.encode(records))
+
+    def append_encoded(self, lines: str):
+        """Append already encoded journal lines and fsync the journal"""
+        if not lines:
+            return
+
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries += lines.count("\n")
+
+    @staticmethod
+    def encode_snapshot(records: List[dict]) -> str:
+        """Encode records as snapshot file text"""
+        return json.dumps(records, indent=2, ensure_ascii=False)
+
+    def compact(self, records: List[dict]):
+        """Write a fresh snapshot and truncate the journal"""
+        self.write_snapshot(self.encode_snapshot(records))
+
+    def compact_from_disk(self):
+        """Fold the journal into the snapshot by replaying both from disk.
+
+        Needs no in-memory records, so it can run in a writer thread while
+        handlers keep changing them.
+        """
+        self.write_snapshot(self.encode_snapshot(self.load()))
+
+    def write_snapshot(self, text: str):
+        """Write already encoded snapshot text and truncate the journal"""
+        tmp_path = self.snapshot_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Only drop the journal once the snapshot containing it is durable.
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+        self.entries = 0
+
+
+class PersistenceScheduler:
+    """Group-commit writer that flushes dirty collections from a background task.
+
+    Request handlers call ``mark_dirty()`` and return immediately. The flush loop
+    wakes up every ``interval`` seconds, or as soon as ``max_pending`` records are
+    waiting or a durable write is requested, and hands everything collected so
+    far to ``write_fn`` in a worker thread, so a burst of submissions shares one
+    disk write per collection. ``encode_fn`` runs on the event loop first, so
+    records are serialized before handlers can change them again.
+    """
+
+    def __init__(self, write_fn: Callable[[Any], None],
+                 encode_fn: Optional[Callable[[Dict[str, List[dict]]], Any]] = None,
+                 interval: float = 0.05, max_pending: int = 256):
+        self.write_fn = write_fn
+        self.encode_fn = encode_fn
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, List[dict]] = {}
+        self._pending_count = 0
+        self._waiters: List[asyncio.Future] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def mark_dirty(self, collection: str, records: Iterable[dict] = (), durable: bool = False) -> Optional[asyncio.Future]:
+        """Queue changed records of a collection for the next flush.
+
+        With ``durable=True`` a future is returned that resolves once the
+        records have been written to disk.
+        """
+        records = list(records)
+        self._pending.setdefault(collection, []).extend(records)
+        self._pending_count += len(records)
+
+        waiter = None
+        if durable:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+
+        if durable or self._pending_count >= self.max_pending:
+            self._wakeup.set()
+        return waiter
+
+    async def flush(self):
+        """Write everything queued so far"""
+        async with self._flush_lock:
+            if not self._pending and not self._waiters:
+                return
+            batch, self._pending, self._pending_count = self._pending, {}, 0
+            waiters, self._waiters = self._waiters, []
+
+            try:
+                payload = self.encode_fn(batch) if self.encode_fn else batch
+                await asyncio.to_thread(self.write_fn, payload)
+            except Exception as e:
+                print(f"Error flushing {', '.join(batch)}: {e}")
+                # Keep the records queued so the next flush retries them
+                for collection, records in batch.items():
+                    self._pending.setdefault(collection, [])[:0] = records
+                    self._pending_count += len(records)
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                return
+
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the background flush loop on the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop after writing anything still queued"""
+        if self._task is not None:
+            # Not cancelled: a write in progress in the worker thread would go on
+            # after the flush lock is released and race the final flush
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+# Columns every backend can filter on. Each collection maps them to a dotted path
+# into its records, e.g. complaints keep the contact number under complainant.
+INDEX_COLUMNS = ("contact_number", "ward", "status", "severity", "submitted_at", "category")
+# Equality filters accepted by query()
+FILTER_COLUMNS = ("contact_number", "ward", "status", "severity", "category")
+
+
+def encode_cursor(key: tuple) -> str:
+    """Opaque pagination cursor for a (submitted_at, id) sort key"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Sort key from a cursor made by encode_cursor(), raising ValueError when malformed"""
+    try:
+        submitted_at, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(submitted_at, str) or not isinstance(record_id, str):
+        raise ValueError("Invalid cursor")
+    return submitted_at, record_id
+
+
+def extract_field(record: dict, path: Optional[str]):
+    """Follow a dotted path into a record, returning None when any part is missing"""
+    if not path:
+        return None
+    value = record
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class Repository:
+    """Change notification shared by the storage backends.
+
+    Listeners are called on the event loop as ``listener(collection, op, record,
+    previous)`` after every insert (``op="insert"``, ``previous=None``) and update
+    (``op="update"``), where ``previous`` holds the record's index column values
+    from before the change. ``version`` increases with every change and reload.
+    """
+
+    name: str
+    fields: Dict[str, str]
+
+    def __init__(self):
+        self.listeners: List[Callable[[str, str, dict, Optional[dict]], None]] = []
+        self.version = 0
+
+    def subscribe(self, listener: Callable[[str, str, dict, Optional[dict]], None]):
+        self.listeners.append(listener)
+
+    def field(self, record: dict, column: str) -> Optional[str]:
+        """Value of an index column for a record, as text like the SQLite columns"""
+        value = extract_field(record, self.fields.get(column))
+        return value if value is None or isinstance(value, str) else str(value)
+
+    def columns(self, record: dict) -> Dict[str, Any]:
+        """All index column values of a record"""
+        return {column: self.field(record, column) for column in INDEX_COLUMNS}
+
+    def sort_key(self, record: dict) -> tuple:
+        """Stable pagination order: submission/creation time, then id"""
+        return self.field(record, "submitted_at") or "", record["id"]
+
+    def _notify(self, op: str, record: dict, previous: Optional[dict]):
+        self.version += 1
+        for listener in self.listeners:
+            try:
+                listener(self.name, op, record, previous)
+            except Exception as e:
+                print(f"Error in {self.name} change listener: {e}")
+
+
+class JsonRepository(Repository):
+    """Collection held as an in-memory list and persisted through a JsonStore.
+
+    Records are indexed by id and by case-folded id. A list of sort keys
+    ``(submitted_at, id)`` is kept in order for cursor pagination, and each
+    column in ``indexed`` gets a value -> sorted keys multi-map that ``find()``
+    and ``query()`` read instead of scanning the collection.
+    """
+
+    def __init__(self, store: "JsonStore", name: str, journal: CollectionJournal, fields: Dict[str, str],
+                 indexed: Iterable[str] = FILTER_COLUMNS):
+        super().__init__()
+        self.store = store
+        self.name = name
+        self.journal = journal
+        self.fields = fields
+        self.records: List[dict] = []
+        # id -> record, its position in records, and case-folded id -> first record with that key
+        self._by_id: Dict[str, dict] = {}
+        self._positions: Dict[str, int] = {}
+        self._by_key: Dict[str, dict] = {}
+        # Sorted (submitted_at, id) keys of all records, and per indexed column
+        # value -> sorted keys of the records with that value
+        self._ordered: List[tuple] = []
+        self._secondary: Dict[str, Dict[Any, List[tuple]]] = {column: {} for column in indexed if column in fields}
+        # Index column values and sort key each id was last filed under
+        self._filed: Dict[str, Tuple[Dict[str, Any], tuple]] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.records)
+
+    def all(self) -> List[dict]:
+        return self.records
+
+    def get(self, record_id: str) -> Optional[dict]:
+        return self._by_id.get(record_id)
+
+    def lookup(self, record_id: str) -> Optional[dict]:
+        """Exact id match, falling back to a case-insensitive match"""
+        return self._by_id.get(record_id) or self._by_key.get(record_id.casefold())
+
+    def _matches(self, record: dict, criteria: dict) -> bool:
+        return all(self.field(record, column) == value for column, value in criteria.items())
+
+    def find(self, **criteria) -> List[dict]:
+        """Records whose index columns equal the given values"""
+        for column, value in criteria.items():
+            if column in self._secondary:
+                candidates = [self._by_id[record_id] for _, record_id in self._secondary[column].get(value, ())]
+                break
+        else:
+            candidates = self.records
+        return [r for r in candidates if self._matches(r, criteria)]
+
+    def count(self, **criteria) -> int:
+        if len(criteria) == 1:
+            column, value = next(iter(criteria.items()))
+            if column in self._secondary:
+                return len(self._secondary[column].get(value, ()))
+        return len(self.find(**criteria)) if criteria else len(self.records)
+
+    def count_by(self, column: str) -> Dict[Any, int]:
+        """Number of records per value of an index column"""
+        if column in self._secondary:
+            return {value: len(keys) for value, keys in self._secondary[column].items() if keys}
+        return dict(Counter(self.field(record, column) for record in self.records))
+
+    def page(self, offset: int, limit: int) -> List[dict]:
+        """Records in insertion order, starting at ``offset``"""
+        return self.records[offset:offset + limit]
+
+    def query(self, filters: Dict[str, Any], date_from: Optional[str] = None, date_to: Optional[str] = None,
+              descending: bool = False, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], Optional[str]]:
+        """One page of records matching ``filters``, ordered by (submitted_at, id).
+
+        ``date_from``/``date_to`` bound submitted_at inclusively (a date matches
+        the whole day). Returns the page and the cursor of the next one, if any.
+        """
+        # Walk the smallest index bucket that satisfies one of the filters
+        keys = self._ordered
+        for column, value in filters.items():
+            if column in self._secondary:
+                bucket = self._secondary[column].get(value, [])
+                if len(bucket) < len(keys):
+                    keys = bucket
+
+        low = bisect.bisect_left(keys, (date_from,)) if date_from else 0
+        high = bisect.bisect_left(keys, (date_to + "\uffff",)) if date_to else len(keys)
+        if cursor:
+            after = decode_cursor(cursor)
+            if descending:
+                high = min(high, bisect.bisect_left(keys, after))
+            else:
+                low = max(low, bisect.bisect_right(keys, after))
+
+        positions = range(high - 1, low - 1, -1) if descending else range(low, high)
+        items = []
+        for position in positions:
+            record = self._by_id[keys[position][1]]
+            if self._matches(record, filters):
+                items.append(record)
+                if len(items) > limit:
+                    break
+
+        if len(items) > limit:
+            items = items[:limit]
+            return items, encode_cursor(self.sort_key(items[-1]))
+        return items, None
+
+    def _index(self, record: dict) -> Optional[dict]:
+        """Index a record, returning the column values it was filed under before"""
+        record_id = record["id"]
+        self._by_id[record_id] = record
+        self._by_key.setdefault(record_id.casefold(), record)
+
+        current = self.columns(record)
+        key = self.sort_key(record)
+        previous, previous_key = self._filed.get(record_id, (None, None))
+        if previous_key != key:
+            if previous_key is not None:
+                del self._ordered[bisect.bisect_left(self._ordered, previous_key)]
+            bisect.insort(self._ordered, key)
+        for column, buckets in self._secondary.items():
+            if previous is not None:
+                if previous[column] == current[column] and previous_key == key:
+                    continue
+                bucket = buckets[previous[column]]
+                del bucket[bisect.bisect_left(bucket, previous_key)]
+            bisect.insort(buckets.setdefault(current[column], []), key)
+        self._filed[record_id] = (current, key)
+        return previous
+
+    def _replace(self, record: dict):
+        """Put a replacement dict in place of the record with its id"""
+        current = self._by_id.get(record["id"])
+        if current is None or current is record:
+            return
+        self.records[self._positions[record["id"]]] = record
+        key = record["id"].casefold()
+        if self._by_key.get(key) is current:
+            self._by_key[key] = record
+
+    def load(self):
+        self.version += 1
+        self.records = self.journal.load()
+        self._by_id = {}
+        self._positions = {record["id"]: position for position, record in enumerate(self.records)}
+        self._by_key = {}
+        self._ordered = []
+        self._secondary = {column: {} for column in self._secondary}
+        self._filed = {}
+        for record in self.records:
+            self._index(record)
+
+    async def add(self, *records, durable: Optional[bool] = None):
+        """Insert new records"""
+        for record in records:
+            self._positions[record["id"]] = len(self.records)
+            self.records.append(record)
+        for record in records:
+            self._index(record)
+            self._notify("insert", record, None)
+        await self.store.persist(self.name, records, durable)
+
+    async def update(self, *records, durable: Optional[bool] = None):
+        """Persist records that were changed in place, or copies replacing them"""
+        for record in records:
+            self._replace(record)
+            previous = self._index(record)
+            self._notify("update", record, previous)
+        await self.store.persist(self.name, records, durable)
+
+
+class JsonStore:
+    """Snapshot + journal persistence for JsonRepository collections.
+
+    ``mode="journal"`` appends changed records to per-collection journals,
+    ``mode="snapshot"`` rewrites the whole file of each changed collection.
+    Only the changed records are encoded on the event loop; snapshots are
+    rebuilt in the writer thread from the files on disk, so the time spent
+    on the loop does not grow with the collection.
+    """
+
+    def __init__(self, mode: str = "journal", compact_after: int = 1000,
+                 interval: float = 0.05, max_pending: int = 256, durable: bool = False):
+        self.mode = mode
+        self.compact_after = compact_after
+        self.durable = durable
+        self.repositories: Dict[str, JsonRepository] = {}
+        self.scheduler = PersistenceScheduler(
+            self.write_batch,
+            encode_fn=self.encode_batch,
+            interval=interval,
+            max_pending=max_pending,
+        )
+
+    def repository(self, name: str, snapshot_path: Path, fields: Dict[str, str]) -> JsonRepository:
+        repository = JsonRepository(self, name, CollectionJournal(snapshot_path), fields)
+        self.repositories[name] = repository
+        return repository
+
+    def load(self):
+        for repository in self.repositories.values():
+            repository.load()
+
+    def save(self):
+        """Write full snapshots of every collection, folding in the journals"""
+        for repository in self.repositories.values():
+            repository.journal.compact(repository.records)
+
+    def encode_batch(self, batch: Dict[str, List[dict]]) -> dict:
+        """Serialize the changed records of a batch on the event loop for write_batch().
+
+        Encoded here, not in the writer thread: handlers change records in place.
+        """
+        encoded = {}
+        for name, records in batch.items():
+            journal = self.repositories[name].journal
+            # A record changed several times since the last flush is written once
+            latest = {record["id"]: record for record in records}
+            lines = journal.encode(latest.values())
+            # Snapshot mode folds every flush into the snapshot at once
+            compact = bool(latest) and (self.mode != "journal" or journal.entries + len(latest) >= self.compact_after)
+            encoded[name] = (lines, compact)
+        return encoded
+
+    def write_batch(self, encoded: dict):
+        """Write an encoded batch: one journal append per collection, plus any compactions due"""
+        for name, (lines, compact) in encoded.items():
+            journal = self.repositories[name].journal
+            journal.append_encoded(lines)
+            if compact:
+                journal.compact_from_disk()
+
+    async def persist(self, name: str, records: Iterable[dict], durable: Optional[bool] = None):
+        """Queue changed records of a collection for the background writer"""
+        durable = self.durable if durable is None else durable
+        if not self.scheduler.running:
+            # No background writer (app imported without its lifespan), write inline
+            try:
+                self.write_batch(self.encode_batch({name: list(records)}))
+            except Exception as e:
+                print(f"Error saving {name}: {e}")
+            return
+
+        waiter = self.scheduler.mark_dirty(name, records, durable=durable)
+        if waiter is not None:
+            await waiter
+
+    def start(self):
+        self.scheduler.start()
+
+    async def stop(self):
+        await self.scheduler.stop()
+
+
+class Document(dict):
+    """Decoded SQLite record; a dict subclass so the repository can refer to it weakly"""
+
+
+class SqliteRepository(Repository):
+    """Collection stored as JSON documents in an SQLite table with indexed columns.
+
+    Records in use are shared: while a handler holds a record, reads of the
+    same id return that object, so concurrent handlers change one dict as with
+    the JSON backend instead of overwriting each other's copies. Writes are
+    encoded on the event loop and written in order by a worker thread.
+    Listeners are notified once a write has committed, with the records as
+    written, so every notification matches a change the table really holds.
+    """
+
+    def __init__(self, store: "SqliteStore", name: str, snapshot_path: Path, fields: Dict[str, str]):
+        super().__init__()
+        self.store = store
+        self.name = name
+        self.snapshot_path = Path(snapshot_path)
+        self.fields = fields
+        self._live: "weakref.WeakValueDictionary[str, Document]" = weakref.WeakValueDictionary()
+        # id -> [writes not yet committed, record]
+        self._unwritten: Dict[str, list] = {}
+        self._write_lock = asyncio.Lock()
+
+    def _held(self, record_id: str) -> Optional[dict]:
+        """The record object in use for an id, if any"""
+        pending = self._unwritten.get(record_id)
+        return pending[1] if pending is not None else self._live.get(record_id)
+
+    def _document(self, data: str) -> dict:
+        """The record in use for a stored row, or the row decoded if nobody holds it"""
+        record = Document(json.loads(data))
+        held = self._held(record["id"])
+        return held if held is not None else self._live.setdefault(record["id"], record)
+
+    def _where(self, criteria: dict):
+        for column in criteria:
+            if column not in INDEX_COLUMNS:
+                raise ValueError(f"{column} is not an indexed column of {self.name}")
+        if not criteria:
+            return "", ()
+        clause = " AND ".join(f"{column} = ?" for column in criteria)
+        return f" WHERE {clause}", tuple(criteria.values())
+
+    def _rows(self, where: str = "", params: tuple = ()) -> Iterator[dict]:
+        with self.store.lock:
+            cursor = self.store.connection.execute(f"SELECT data FROM {self.name}{where} ORDER BY seq", params)
+        while True:
+            # Fetch in batches so large collections are decoded incrementally
+            with self.store.lock:
+                rows = cursor.fetchmany(500)
+            if not rows:
+                return
+            for (data,) in rows:
+                yield self._document(data)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __iter__(self) -> Iterator[dict]:
+        return self._rows()
+
+    def all(self) -> List[dict]:
+        return list(self._rows())
+
+    def get(self, record_id: str) -> Optional[dict]:
+        record = self._held(record_id)
+        if record is not None:
+            return record
+        with self.store.lock:
+            row = self.store.connection.execute(f"SELECT data FROM {self.name} WHERE id = ?", (record_id,)).fetchone()
+        return self._document(row[0]) if row else None
+
+    def lookup(self, record_id: str) -> Optional[dict]:
+        """Exact id match, falling back to a case-insensitive match"""
+        record = self.get(record_id)
+        if record is not None:
+            return record
+        with self.store.lock:
+            row = self.store.connection.execute(
+                f"SELECT data FROM {self.name} WHERE lower(id) = lower(?) ORDER BY seq LIMIT 1", (record_id,)
+            ).fetchone()
+        return self._document(row[0]) if row else None
+
+    def find(self, **criteria) -> List[dict]:
+        """Records whose index columns equal the given values"""
+        return list(self._rows(*self._where(criteria)))
+
+    def count(self, **criteria) -> int:
+        where, params = self._where(criteria)
+        with self.store.lock:
+            return self.store.connection.execute(f"SELECT COUNT(*) FROM {self.name}{where}", params).fetchone()[0]
+
+    def count_by(self, column: str) -> Dict[Any, int]:
+        """Number of records per value of an index column"""
+        if column not in INDEX_COLUMNS:
+            raise ValueError(f"{column} is not an indexed column of {self.name}")
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                f"SELECT {column}, COUNT(*) FROM {self.name} GROUP BY {column} ORDER BY MIN(seq)"
+            ).fetchall()
+        return dict(rows)
+
+    def page(self, offset: int, limit: int) -> List[dict]:
+        """Records in insertion order, starting at ``offset``"""
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                f"SELECT data FROM {self.name} ORDER BY seq LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [self._document(data) for (data,) in rows]
+
+    def query(self, filters: Dict[str, Any], date_from: Optional[str] = None, date_to: Optional[str] = None,
+              descending: bool = False, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], Optional[str]]:
+        """One page of records matching ``filters``, ordered by (submitted_at, id).
+
+        ``date_from``/``date_to`` bound submitted_at inclusively (a date matches
+        the whole day). Returns the page and the cursor of the next one, if any.
+        """
+        where, params = self._where(filters)
+        clauses = [where[len(" WHERE "):]] if where else []
+        params = list(params)
+        if date_from:
+            clauses.append("submitted_at >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("submitted_at < ?")
+            params.append(date_to + "\uffff")
+        if cursor:
+            clauses.append(f"(submitted_at, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        direction = "DESC" if descending else "ASC"
+
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                f"SELECT data FROM {self.name}{where} ORDER BY submitted_at {direction}, id {direction} LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        items = [self._document(data) for (data,) in rows]
+
+        if len(items) > limit:
+            items = items[:limit]
+            return items, encode_cursor(self.sort_key(items[-1]))
+        return items, None
+
+    def load(self):
+        """Create the table and indexes, importing the JSON snapshot into an empty table"""
+        self.version += 1
+        columns = ", ".join(f"{column} TEXT" for column in INDEX_COLUMNS)
+        with self.store.lock:
+            connection = self.store.connection
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.name} ("
+                f"seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, {columns}, data TEXT NOT NULL)"
+            )
+            existing = {row[1] for row in connection.execute(f"PRAGMA table_info({self.name})")}
+            missing = [column for column in INDEX_COLUMNS if column not in existing]
+            for column in missing:
+                connection.execute(f"ALTER TABLE {self.name} ADD COLUMN {column} TEXT")
+            for column in INDEX_COLUMNS:
+                connection.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_{column} ON {self.name} ({column})")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_id_key ON {self.name} (lower(id))")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_timeline ON {self.name} (submitted_at, id)")
+            connection.commit()
+            empty = connection.execute(f"SELECT 1 FROM {self.name} LIMIT 1").fetchone() is None
+
+        if missing and not empty:
+            # Tables created before a column was indexed: fill it in from the documents
+            self._upsert(list(self._rows()))
+            print(f"Added {', '.join(missing)} to {self.name}")
+
+        if empty and (self.snapshot_path.exists() or self.snapshot_path.with_suffix(".journal").exists()):
+            records = CollectionJournal(self.snapshot_path).load()
+            self._upsert(records)
+            print(f"Imported {len(records)} {self.name} records from {self.snapshot_path}")
+
+    def _encode(self, records: Iterable[dict]) -> List[tuple]:
+        """Table rows of records: id, index columns and the JSON document"""
+        rows = []
+        for record in records:
+            values = self.columns(record)
+            values["submitted_at"] = values["submitted_at"] or ""
+            rows.append((record["id"], *values.values(), json.dumps(record, ensure_ascii=False, separators=(",", ":"))))
+        return rows
+
+    def _write(self, rows: List[tuple]):
+        columns = ", ".join(INDEX_COLUMNS)
+        placeholders = ", ".join("?" for _ in INDEX_COLUMNS)
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in INDEX_COLUMNS + ("data",))
+        with self.store.lock:
+            with self.store.connection:
+                self.store.connection.executemany(
+                    f"INSERT INTO {self.name} (id, {columns}, data) VALUES (?, {placeholders}, ?) "
+                    f"ON CONFLICT(id) DO UPDATE SET {assignments}",
+                    rows,
+                )
+
+    def _upsert(self, records: Iterable[dict]):
+        """Write records synchronously"""
+        self._write(self._encode(records))
+
+    def _stored_columns(self, ids: List[str]) -> Dict[str, dict]:
+        """Index column values of records as stored"""
+        previous = {}
+        columns = ", ".join(INDEX_COLUMNS)
+        with self.store.lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                cursor = self.store.connection.execute(
+                    f"SELECT id, {columns} FROM {self.name} WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+                )
+                for row in cursor:
+                    previous[row[0]] = dict(zip(INDEX_COLUMNS, row[1:]))
+        return previous
+
+    def _commit(self, op: str, rows: List[tuple]) -> Tuple[Dict[str, dict], List[dict]]:
+        """Write rows; the index columns they replaced and the records as written"""
+        previous = self._stored_columns([row[0] for row in rows]) if op == "update" else {}
+        self._write(rows)
+        return previous, [json.loads(row[-1]) for row in rows]
+
+    async def _persist(self, op: str, records: tuple):
+        # Encoded on the loop, before a handler can change the records again
+        rows = self._encode(records)
+        for record in records:
+            # Held until written, so reads in the meantime see this object
+            pending = self._unwritten.setdefault(record["id"], [0, record])
+            pending[0] += 1
+            pending[1] = record
+            if self._live.get(record["id"]) is not record:
+                # A copy replacing the record: later reads must not return the object it replaced
+                self._live.pop(record["id"], None)
+        try:
+            # The lock is first come, first served, so rows reach the table in the order they
+            # were encoded, and listeners hear of each write only once it has committed
+            async with self._write_lock:
+                previous, written = await asyncio.to_thread(self._commit, op, rows)
+                for record in written:
+                    self._notify(op, record, previous.get(record["id"]))
+        finally:
+            for record in records:
+                pending = self._unwritten[record["id"]]
+                pending[0] -= 1
+                if pending[0] == 0:
+                    del self._unwritten[record["id"]]
+
+    async def add(self, *records, durable: Optional[bool] = None):
+        """Insert new records"""
+        await self._persist("insert", records)
+
+    async def update(self, *records, durable: Optional[bool] = None):
+        """Persist records that were changed in place, or copies replacing them"""
+        await self._persist("update", records)
+
+
+class SqliteStore:
+    """Embedded SQLite database in WAL mode holding one table per collection"""
+
+    def __init__(self, path: Path, durable: bool = False):
+        self.path = Path(path)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # NORMAL survives application crashes, FULL also survives power loss
+        self.connection.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+        self.repositories: Dict[str, SqliteRepository] = {}
+
+    def repository(self, name: str, snapshot_path: Path, fields: Dict[str, str]) -> SqliteRepository:
+        repository = SqliteRepository(self, name, snapshot_path, fields)
+        self.repositories[name] = repository
+        return repository
+
+    def load(self):
+        for repository in self.repositories.values():
+            repository.load()
+
+    def save(self):
+        """Checkpoint the write-ahead log into the database file"""
+        with self.lock:
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        await asyncio.to_thread(self.save)
@@ -0,0 +1,54 @@
+import json
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional
+
+# Records encoded per chunk handed to the server
+STREAM_CHUNK_RECORDS = 200
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def dump(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+async def stream_ndjson(records: Iterable[dict], transform: Optional[Callable[[dict], dict]] = None) -> AsyncIterator[bytes]:
+    """Encode records as newline-delimited JSON, a chunk of records at a time"""
+    chunk = []
+    for record in records:
+        chunk.append(dump(transform(record) if transform else record))
+        if len(chunk) >= STREAM_CHUNK_RECORDS:
+            yield ("\n".join(chunk) + "\n").encode("utf-8")
+            chunk = []
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode("utf-8")
+
+
+async def stream_json_object(head: Dict[str, object], arrays: Dict[str, Iterable[dict]],
+                             total_key: Optional[str] = None,
+                             transform: Optional[Callable[[dict], dict]] = None) -> AsyncIterator[bytes]:
+    """Encode ``{**head, key: [records...], ..., total_key: n}`` as a chunked JSON object.
+
+    Only one chunk of records is held at a time; the number of records
+    written is appended as ``total_key`` once the arrays are done.
+    """
+    total = 0
+    parts = [dump(key) + ": " + dump(value) for key, value in head.items()]
+    yield ("{" + ", ".join(parts)).encode("utf-8")
+    separator = ", " if parts else ""
+
+    for key, records in arrays.items():
+        chunk = [separator + dump(key) + ": ["]
+        separator = ", "
+        first = True
+        for record in records:
+            chunk.append(("" if first else ",") + dump(transform(record) if transform else record))
+            first = False
+            total += 1
+            if len(chunk) >= STREAM_CHUNK_RECORDS:
+                yield "".join(chunk).encode("utf-8")
+                chunk = []
+        chunk.append("]")
+        yield "".join(chunk).encode("utf-8")
+
+    tail = f"{separator}{dump(total_key)}: {total}" if total_key else ""
+    yield (tail + "}").encode("utf-8")
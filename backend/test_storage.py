@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Tests for the JSON collection journal
+"""
+
+import tempfile
+from pathlib import Path
+
+from storage import CollectionJournal
+
+
+def test_torn_journal_tail():
+    """Records appended after a crash mid-append survive the next restart"""
+    with tempfile.TemporaryDirectory() as directory:
+        journal = CollectionJournal(Path(directory) / "complaints.json")
+        journal.append([{"id": "a"}])
+        # The process died while writing the next entry
+        with open(journal.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"op":"put","record":{"id":"x"')
+
+        assert journal.load() == [{"id": "a"}]
+        journal.append([{"id": "b"}, {"id": "c"}])
+
+        reloaded = CollectionJournal(journal.snapshot_path)
+        assert reloaded.load() == [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+        assert reloaded.entries == 3
+
+
+if __name__ == "__main__":
+    test_torn_journal_tail()
+    print("✅ Torn journal tail test passed")
@@ -0,0 +1,505 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import stat
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Union
+
+import aiofiles
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse, JSONResponse, Response
+
+from caching import etag_matches
+
+# Bytes copied from an upload per read/write
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Content-addressed files never change; everything else may be replaced in place
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UPLOAD_CACHE_CONTROL = "public, max-age=86400"
+
+
+def referenced_paths(record: dict) -> Iterator[str]:
+    """Upload paths a stored record points at"""
+    files = record.get("files")
+    if isinstance(files, dict):
+        for value in files.values():
+            for path in value if isinstance(value, list) else [value]:
+                if isinstance(path, str) and path:
+                    yield path
+    if record.get("drone_file_path"):
+        yield record["drone_file_path"]
+
+
+def file_sha256(path: Path, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """SHA-256 of a file on disk, read a chunk at a time"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_suffix(filename: Optional[str]) -> str:
+    """Lower-cased extension of an uploaded file name, kept only when it is plain"""
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,10}", suffix) else ""
+
+
+class ContentStore:
+    """Uploads stored once per distinct content, keyed by SHA-256.
+
+    Blobs live at ``<root>/<aa>/<bb>/<sha256><ext>``. Each blob has a count of
+    the records referencing it, rebuilt from the records at startup, and is
+    only deleted when its last reference is released.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.tmp_dir = root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.refs: Counter = Counter()
+
+    def path_for(self, digest: str, suffix: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+
+    def digest_of(self, path: Path) -> Optional[str]:
+        """SHA-256 a stored blob is named after, or None for files outside the store"""
+        if path.parent.parent.parent != self.root.resolve() or not re.fullmatch(r"[0-9a-f]{64}", path.stem):
+            return None
+        return path.stem
+
+    def temp_path(self) -> Path:
+        return self.tmp_dir / f"{uuid.uuid4()}.part"
+
+    def reference(self, digest: str, suffix: str) -> Optional[str]:
+        """Take a reference to an existing blob; None when the content is new"""
+        path = self.path_for(digest, suffix)
+        if not path.exists():
+            return None
+        self.refs[str(path)] += 1
+        return str(path)
+
+    def acquire(self, path: str):
+        """Take another reference to a stored blob"""
+        self.refs[path] += 1
+
+    def commit(self, temp_path: Path, digest: str, suffix: str) -> str:
+        """Move a fully written temp file into place and take a reference to it"""
+        path = self.path_for(digest, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, path)
+        self.refs[str(path)] += 1
+        return str(path)
+
+    def release(self, path: str):
+        """Drop one reference, deleting the blob when none are left"""
+        if path not in self.refs:
+            return
+        self.refs[path] -= 1
+        if self.refs[path] <= 0:
+            del self.refs[path]
+            Path(path).unlink(missing_ok=True)
+
+    def rebuild(self, records: Iterable[dict]):
+        """Recount references from the stored records and clear abandoned temp files"""
+        self.refs.clear()
+        prefix = str(self.root) + os.sep
+        for record in records:
+            for path in referenced_paths(record):
+                if path.startswith(prefix):
+                    self.refs[path] += 1
+        for leftover in self.tmp_dir.glob("*.part"):
+            leftover.unlink(missing_ok=True)
+
+
+class UploadBatch:
+    """Files saved for one request.
+
+    The multipart parser has already spooled each file (``RequestSizeLimit``
+    bounds how much it can spool). Each file is read once to compute its
+    SHA-256 and check the per-file and per-request size limits; content
+    already in the store is then just referenced, and only new content is
+    copied into the store through aiofiles. Nothing blocks the event loop.
+    Every reference taken and every partial file is remembered so a failed
+    request can undo them, until keep() hands them to the stored records.
+    """
+
+    def __init__(self, store: ContentStore, max_file_size: int, max_request_size: int,
+                 chunk_size: int = UPLOAD_CHUNK_SIZE):
+        self.store = store
+        self.max_file_size = max_file_size
+        self.max_request_size = max_request_size
+        self.chunk_size = chunk_size
+        self.total = 0
+        self.paths: List[str] = []
+        self.partial: List[Path] = []
+
+    def _too_large(self, file: UploadFile, limit: int, scope: str) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"Upload too large: {file.filename} exceeds the {scope} limit of {limit} bytes"
+        )
+
+    async def save(self, file: Optional[UploadFile]) -> str:
+        """Store one upload and return its content-addressed path"""
+        if not file:
+            return ""
+        if file.size is not None and file.size > self.max_file_size:
+            raise self._too_large(file, self.max_file_size, "per-file")
+
+        digest = hashlib.sha256()
+        written = 0
+        await file.seek(0)
+        while True:
+            chunk = await file.read(self.chunk_size)
+            if not chunk:
+                break
+            written += len(chunk)
+            self.total += len(chunk)
+            if written > self.max_file_size:
+                raise self._too_large(file, self.max_file_size, "per-file")
+            if self.total > self.max_request_size:
+                raise self._too_large(file, self.max_request_size, "per-request")
+            await asyncio.to_thread(digest.update, chunk)
+
+        digest, suffix = digest.hexdigest(), file_suffix(file.filename)
+        path = self.store.reference(digest, suffix)
+        if path is None:
+            temp_path = self.store.temp_path()
+            self.partial.append(temp_path)
+            await file.seek(0)
+            async with aiofiles.open(temp_path, "wb") as buffer:
+                while True:
+                    chunk = await file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    await buffer.write(chunk)
+            path = self.store.commit(temp_path, digest, suffix)
+            self.partial.remove(temp_path)
+
+        self.paths.append(path)
+        return path
+
+    def reference(self, path: str) -> str:
+        """Use an already stored file (e.g. a finished resumable upload) in this request"""
+        self.store.acquire(path)
+        self.paths.append(path)
+        return path
+
+    async def save_all(self, fields: Dict[str, Union[UploadFile, List[UploadFile], None]]) -> Dict[str, Union[str, List[str]]]:
+        """Save every file of a submission concurrently.
+
+        List fields map to a list of paths and single fields to a path, or
+        ``""`` when nothing was uploaded. If any file fails, the others are
+        allowed to finish before the first error is raised, so discard()
+        sees every path.
+        """
+        jobs = []
+        for name, value in fields.items():
+            files = value if isinstance(value, list) else [value]
+            for file in files:
+                if file:
+                    jobs.append((name, self.save(file)))
+
+        results = await asyncio.gather(*(job for _, job in jobs), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        saved: Dict[str, Union[str, List[str]]] = {
+            name: [] if isinstance(value, list) else "" for name, value in fields.items()
+        }
+        for (name, _), path in zip(jobs, results):
+            if isinstance(saved[name], list):
+                saved[name].append(path)
+            else:
+                saved[name] = path
+        return saved
+
+    def keep(self):
+        """Hand the references over to the records now stored with these paths.
+
+        Called once the records are persisted; a later failure of the request
+        must not release files they point at, so discard() does nothing after this.
+        """
+        self.paths.clear()
+        self.partial.clear()
+
+    def discard(self):
+        """Release every file stored for this request and remove partial writes"""
+        for path in self.paths:
+            try:
+                self.store.release(path)
+            except OSError as e:
+                print(f"Error removing upload {path}: {e}")
+        for temp_path in self.partial:
+            temp_path.unlink(missing_ok=True)
+        self.paths.clear()
+        self.partial.clear()
+
+
+class RequestSizeLimit:
+    """ASGI middleware rejecting request bodies larger than ``max_size`` bytes.
+
+    A declared ``Content-Length`` over the limit is answered with 413 before
+    anything is read. Otherwise the body is counted as it arrives, which also
+    covers chunked requests without a length: once the count passes the
+    limit, reading it raises a 413, so the multipart parser never spools more
+    than ``max_size`` bytes.
+    """
+
+    def __init__(self, app, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    def _too_large(self) -> str:
+        return f"Request body exceeds the limit of {self.max_size} bytes"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_size:
+                await JSONResponse(status_code=413, content={"detail": self._too_large()})(scope, receive, send)
+                return
+
+        received = 0
+
+        async def counted_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    raise HTTPException(status_code=413, detail=self._too_large())
+            return message
+
+        await self.app(scope, counted_receive, send)
+
+
+class UploadSessions:
+    """Resumable uploads: a session per file, filled by chunk PUTs at explicit offsets.
+
+    Each session is a small JSON file next to a ``.part`` file holding the
+    bytes received so far, so an interrupted transfer resumes from the size
+    of the part file, even across restarts. Chunks are streamed to disk as
+    they arrive. Finalizing hashes the file, checks it against the declared
+    size and optional SHA-256, and moves it into the content store, where the
+    session keeps a reference until it expires.
+    """
+
+    def __init__(self, directory: Path, store: ContentStore, max_size: int, ttl_hours: float = 24):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.store = store
+        self.max_size = max_size
+        self.ttl = timedelta(hours=ttl_hours)
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.json"
+
+    def _part_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.part"
+
+    def _write(self, session: dict):
+        temp_path = self._meta_path(session["id"]).with_suffix(".json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(session, f)
+        os.replace(temp_path, self._meta_path(session["id"]))
+
+    def _load(self, upload_id: str) -> dict:
+        if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        try:
+            with open(self._meta_path(upload_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+
+    def _status(self, session: dict) -> dict:
+        if session["status"] == "complete":
+            offset = session["size"]
+        else:
+            part_path = self._part_path(session["id"])
+            offset = part_path.stat().st_size if part_path.exists() else 0
+        return {**session, "offset": offset}
+
+    def create(self, filename: str, size: int, sha256: Optional[str] = None) -> dict:
+        """Open a session for a file of ``size`` bytes"""
+        if size < 0:
+            raise HTTPException(status_code=400, detail="Upload size must not be negative")
+        if size > self.max_size:
+            raise HTTPException(status_code=413, detail=f"Upload too large: the limit is {self.max_size} bytes")
+        if sha256 is not None and not re.fullmatch(r"[0-9a-fA-F]{64}", sha256):
+            raise HTTPException(status_code=400, detail="sha256 must be 64 hex characters")
+
+        self.expire()
+        session = {
+            "id": uuid.uuid4().hex,
+            "filename": filename,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "status": "uploading",
+            "path": None,
+            "created_at": datetime.now().isoformat()
+        }
+        self._part_path(session["id"]).touch()
+        self._write(session)
+        return self._status(session)
+
+    def status(self, upload_id: str) -> dict:
+        return self._status(self._load(upload_id))
+
+    def _claim(self, upload_id: str) -> asyncio.Lock:
+        """Lock for one operation on a session; a second concurrent one is refused"""
+        lock = self.locks.setdefault(upload_id, asyncio.Lock())
+        if lock.locked():
+            raise HTTPException(status_code=409, detail="Another request for this upload is in progress")
+        return lock
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> dict:
+        """Append a chunk that starts at ``offset``; the offset must match the bytes received so far"""
+        async with self._claim(upload_id):
+            try:
+                session = self._status(self._load(upload_id))
+                if session["status"] == "complete":
+                    raise HTTPException(status_code=409, detail="Upload is already complete")
+                if offset != session["offset"]:
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"Offset mismatch: the upload continues at byte {session['offset']}"
+                    )
+
+                received = offset
+                async with aiofiles.open(self._part_path(upload_id), "ab") as buffer:
+                    async for chunk in chunks:
+                        received += len(chunk)
+                        if received > session["size"]:
+                            raise HTTPException(status_code=413, detail="Chunk runs past the declared upload size")
+                        await buffer.write(chunk)
+                return self.status(upload_id)
+            finally:
+                self.locks.pop(upload_id, None)
+
+    async def complete(self, upload_id: str) -> dict:
+        """Verify a fully received upload and move it into the content store"""
+        async with self._claim(upload_id):
+            try:
+                return await self._complete(upload_id)
+            finally:
+                self.locks.pop(upload_id, None)
+
+    async def _complete(self, upload_id: str) -> dict:
+        session = self._status(self._load(upload_id))
+        if session["status"] == "complete":
+            return session
+        if session["offset"] != session["size"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload incomplete: received {session['offset']} of {session['size']} bytes"
+            )
+
+        part_path = self._part_path(upload_id)
+        digest = await asyncio.to_thread(file_sha256, part_path)
+        if session["sha256"] and digest != session["sha256"]:
+            # The bytes on disk are not the file the client meant to send; start over
+            part_path.write_bytes(b"")
+            raise HTTPException(status_code=422, detail="Checksum mismatch, the upload has been reset")
+
+        suffix = file_suffix(session["filename"])
+        path = self.store.reference(digest, suffix)
+        if path is None:
+            path = self.store.commit(part_path, digest, suffix)
+        else:
+            part_path.unlink(missing_ok=True)
+
+        session.update({"status": "complete", "path": path, "sha256": digest})
+        session.pop("offset", None)
+        self._write(session)
+        return self._status(session)
+
+    def path_of(self, upload_id: str) -> str:
+        """Stored path of a completed upload, for use in a submission"""
+        session = self._load(upload_id)
+        if session["status"] != "complete":
+            raise HTTPException(status_code=400, detail=f"Upload {upload_id} has not been completed")
+        return session["path"]
+
+    def remove(self, upload_id: str, session: Optional[dict] = None):
+        session = session or self._load(upload_id)
+        if session["status"] == "complete" and session.get("path"):
+            self.store.release(session["path"])
+        self._part_path(upload_id).unlink(missing_ok=True)
+        self._meta_path(upload_id).unlink(missing_ok=True)
+
+    def expire(self):
+        """Drop sessions older than the time-to-live, releasing their stored files"""
+        cutoff = (datetime.now() - self.ttl).isoformat()
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    session = json.load(f)
+                if session["created_at"] < cutoff:
+                    self.remove(session["id"], session)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error expiring upload session {meta_path.name}: {e}")
+
+    def restore(self):
+        """After a restart: re-take the references held by completed sessions, then expire old ones"""
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    session = json.load(f)
+                if session["status"] == "complete" and session.get("path"):
+                    self.store.acquire(session["path"])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error restoring upload session {meta_path.name}: {e}")
+        self.expire()
+
+
+class UploadFileResponse(FileResponse):
+    """FileResponse reading in larger blocks, so a media file needs fewer worker thread hand-offs"""
+    chunk_size = 512 * 1024
+
+
+async def serve_upload(request: Request, root: Path, relative_path: str, store: ContentStore,
+                       private: Iterable[Path] = ()) -> Response:
+    """Serve a file under ``root`` with strong validators and a caching policy.
+
+    Content-addressed blobs get their SHA-256 as ETag and are cacheable
+    forever; other files get a size/mtime ETag and a day. Byte ranges (for
+    video seeking) and If-Range come from FileResponse, which also hands the
+    file to the server for zero-copy sending when it supports the ASGI
+    pathsend extension.
+    """
+    base = root.resolve()
+    path = (base / relative_path).resolve()
+    hidden = [directory.resolve() for directory in private]
+    if base not in path.parents or any(directory == path or directory in path.parents for directory in hidden):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    digest = store.digest_of(path)
+    headers = {
+        "ETag": f'"{digest}"' if digest else f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"',
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if digest else UPLOAD_CACHE_CONTROL,
+        "X-Content-Type-Options": "nosniff",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return UploadFileResponse(path, headers=headers, stat_result=stat_result)